@@ -5,7 +5,11 @@ and performing CRUD operations on the database.
 It uses SQLite as the database engine and provides methods to create tables,
 insert data, retrieve data.
 """
+import os
 import sqlite3
+from contextlib import contextmanager
+from urllib.request import pathname2url
+from typing import Callable, Iterable, Iterator
 from person import Person
 from reader import Reader
 
@@ -15,17 +19,87 @@ class Database:
     This class is responsible for managing the database connection 
     and performing CRUD operations on the database.
     It uses SQLite as the database engine.
+    Bulk insert methods write rows with executemany, committing once per batch.
+    Inside a transaction block batches are committed together when the block ends.
     """
-    def __init__(self, db_name:str) -> None:
+    SCHEMA_VERSION = 3
+    BATCH_SIZE = 5000
+    # pragmas making the bulk build faster, WAL with synchronous NORMAL does not fsync every commit
+    BUILD_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64000,
+    }
+    # pragmas of a staging database, it is thrown away when the build fails, so it needs no journal
+    STAGING_PRAGMAS = {
+        'journal_mode': 'OFF',
+        'synchronous': 'OFF',
+        'cache_size': -64000,
+        'temp_store': 'MEMORY',
+    }
+    # authorizations joined to people and readers, readers without authorizations included
+    AUTHORIZATION_REPORT = '''FROM readers
+                           LEFT JOIN authorizations
+                           ON authorizations.reader_number = readers.reader_number
+                           LEFT JOIN people
+                           ON people.person_number = authorizations.person_number'''
+
+    def __init__(self,
+                 db_name:str,
+                 pragmas: dict | None = None,
+                 read_only: bool = False,
+                 check_same_thread: bool = True,
+                 defer_indexes: bool = False) -> None:
         self.db_name = db_name
-        self.conn = sqlite3.connect(self.db_name)
+        self.read_only = read_only
+        self.defer_indexes = defer_indexes
+        self.in_transaction = False
+        if read_only:
+            # read-only connections never create tables or migrate the schema
+            self.conn = sqlite3.connect(f'file:{pathname2url(os.path.abspath(db_name))}?mode=ro',
+                                        uri=True,
+                                        check_same_thread=check_same_thread)
+        else:
+            self.conn = sqlite3.connect(self.db_name, check_same_thread=check_same_thread)
         self.cursor = self.conn.cursor()
-        self.create_tables()
+        if pragmas:
+            self.set_pragmas(pragmas)
+        if not read_only:
+            self.create_tables()
+
+    def set_pragmas(self, pragmas: dict) -> None:
+        """
+        Set SQLite pragmas on the connection, e.g. Database.BUILD_PRAGMAS.
+        """
+        for name, value in pragmas.items():
+            if not name.isidentifier():
+                raise ValueError(f'Invalid pragma name: {name}')
+            self.cursor.execute(f'PRAGMA {name} = {value}')
+
+    def schema_version(self) -> int:
+        """
+        Return the schema version stored in the database file.
+        """
+        self.cursor.execute('''PRAGMA user_version''')
+        return self.cursor.fetchone()[0]
+
+    def has_table(self, table_name: str) -> bool:
+        """
+        Check whether a table exists in the database.
+        """
+        self.cursor.execute('''SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?''',
+                            (table_name,))
+        return self.cursor.fetchone() is not None
 
     def create_tables(self) -> None:
         """
         Create the tables in the database if they do not exist.
+        Databases created by an older version are migrated first.
+        With defer_indexes secondary indexes are created later by publish.
         """
+        if self.has_table('authorizations'):
+            self.migrate()
+
         self.cursor.execute('''CREATE TABLE IF NOT EXISTS people
                             (person_number TEXT PRIMARY KEY,
                             first_name TEXT,
@@ -40,11 +114,135 @@ class Database:
                             location_name TEXT,
                             abi_location TEXT)''')
 
+        self.create_authorizations_table()
+        self.create_snapshot_table()
+        if not self.defer_indexes:
+            self.create_indexes()
+        self.cursor.execute(f'''PRAGMA user_version = {self.SCHEMA_VERSION}''')
+
+    def create_authorizations_table(self) -> None:
+        """
+        Create the authorizations table if it does not exist.
+        The primary key on (person_number, reader_number) keeps authorizations unique
+        and serves lookups by person.
+        """
         self.cursor.execute('''CREATE TABLE IF NOT EXISTS authorizations
-                            (person_number TEXT,
-                            reader_number TEXT,
+                            (person_number TEXT NOT NULL,
+                            reader_number TEXT NOT NULL,
+                            PRIMARY KEY (person_number, reader_number),
                             FOREIGN KEY(person_number) REFERENCES people(person_number),
-                            FOREIGN KEY(reader_number) REFERENCES readers(reader_number))''')
+                            FOREIGN KEY(reader_number) REFERENCES readers(reader_number))
+                            WITHOUT ROWID''')
+
+    def create_snapshot_table(self) -> None:
+        """
+        Create the table holding fingerprints of source document rows if it does not exist.
+        Rows are keyed by the source document and the key of the row within it.
+        """
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS source_snapshot
+                            (source TEXT NOT NULL,
+                            row_key TEXT NOT NULL,
+                            fingerprint TEXT NOT NULL,
+                            PRIMARY KEY (source, row_key))
+                            WITHOUT ROWID''')
+
+    def create_indexes(self) -> None:
+        """
+        Create secondary indexes if they do not exist.
+        Indexes on card numbers, emails and location blueprints serve the query service.
+        """
+        self.cursor.execute('''CREATE INDEX IF NOT EXISTS authorizations_reader_number
+                            ON authorizations (reader_number, person_number)''')
+        self.cursor.execute('''CREATE INDEX IF NOT EXISTS people_card_number
+                            ON people (card_number)''')
+        self.cursor.execute('''CREATE INDEX IF NOT EXISTS people_email
+                            ON people (email COLLATE NOCASE)''')
+        self.cursor.execute('''CREATE INDEX IF NOT EXISTS readers_location_blueprint
+                            ON readers (location_blueprint)''')
+
+    def migrate(self) -> None:
+        """
+        Migrate the database to the current schema version.
+        Each migration runs in its own transaction together with the version bump.
+        """
+        for version in range(self.schema_version() + 1, self.SCHEMA_VERSION + 1):
+            self.cursor.execute('''BEGIN''')
+            try:
+                getattr(self, f'_migrate_to_{version}')()
+                self.cursor.execute(f'''PRAGMA user_version = {version}''')
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+
+    def _migrate_to_1(self) -> None:
+        """
+        Rebuild the authorizations table with a composite primary key, dropping duplicate rows.
+        """
+        self.cursor.execute('''ALTER TABLE authorizations RENAME TO authorizations_v0''')
+        self.create_authorizations_table()
+        self.cursor.execute('''INSERT OR IGNORE INTO authorizations
+                            (person_number, reader_number)
+                            SELECT person_number, reader_number FROM authorizations_v0
+                            WHERE person_number IS NOT NULL AND reader_number IS NOT NULL''')
+        self.cursor.execute('''DROP TABLE authorizations_v0''')
+
+    def _migrate_to_2(self) -> None:
+        """
+        Add the source_snapshot table used by the delta mode.
+        """
+        self.create_snapshot_table()
+
+    def _migrate_to_3(self) -> None:
+        """
+        Add indexes on card numbers, emails and location blueprints used by the query service.
+        """
+        self.create_indexes()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Run the block in a single transaction, committed when the block ends
+        and rolled back when it raises. Nested blocks join the outer transaction.
+        """
+        if self.in_transaction:
+            yield
+            return
+
+        self.in_transaction = True
+        try:
+            if not self.conn.in_transaction:
+                self.cursor.execute('''BEGIN''')
+            yield
+        except BaseException:
+            self.conn.rollback()
+            raise
+        else:
+            self.conn.commit()
+        finally:
+            self.in_transaction = False
+
+    @staticmethod
+    def person_row(person: Person) -> tuple:
+        """
+        Return the values of a person in the column order of the people table.
+        """
+        return (person.person_number,
+                person.first_name,
+                person.last_name,
+                person.card_number,
+                person.email)
+
+    @staticmethod
+    def reader_row(reader: Reader) -> tuple:
+        """
+        Return the values of a reader in the column order of the readers table.
+        """
+        return (reader.reader_number,
+                reader.location_blueprint,
+                reader.location_hospital,
+                reader.location_name,
+                reader.abi_location)
 
     def insert_person(self, person: Person) -> None:
         """
@@ -53,11 +251,7 @@ class Database:
         self.cursor.execute('''INSERT INTO people
                             (person_number, first_name, last_name, card_number, email)
                             VALUES (?, ?, ?, ?, ?)''',
-                            (person.person_number,
-                             person.first_name,
-                             person.last_name,
-                             person.card_number,
-                             person.email))
+                            self.person_row(person))
         self.conn.commit()
 
     def insert_reader(self, reader: Reader) -> None:
@@ -67,24 +261,311 @@ class Database:
         self.cursor.execute('''INSERT INTO readers
                             (reader_number, location_blueprint, location_hospital, location_name, abi_location)
                             VALUES (?, ?, ?, ?, ?)''',
-                            (reader.reader_number,
-                             reader.location_blueprint,
-                             reader.location_hospital,
-                             reader.location_name,
-                             reader.abi_location))
+                            self.reader_row(reader))
         self.conn.commit()
 
     def insert_authorization(self, person: Person, reader: Reader) -> None:
         """
         Insert an authorization into the database.
+        Authorizations already in the database are skipped.
         """
-        self.cursor.execute('''INSERT INTO authorizations
+        self.cursor.execute('''INSERT OR IGNORE INTO authorizations
                             (person_number, reader_number)
                             VALUES (?, ?)''',
                             (person.person_number,
                              reader.reader_number))
         self.conn.commit()
 
+    def _execute_batches(self,
+                         query: str,
+                         rows: Iterable[tuple],
+                         batch_size: int | None,
+                         on_batch: Callable[[int], None] | None) -> int:
+        """
+        Execute the query for every row with executemany, one transaction per batch.
+        on_batch is called with the number of rows written so far after each batch.
+        """
+        batch_size = batch_size or self.BATCH_SIZE
+        written = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                written += self._execute_batch(query, batch)
+                batch = []
+                if on_batch is not None:
+                    on_batch(written)
+
+        if batch:
+            written += self._execute_batch(query, batch)
+            if on_batch is not None:
+                on_batch(written)
+
+        return written
+
+    def _execute_batch(self, query: str, batch: list[tuple]) -> int:
+        """
+        Execute the query for all rows of the batch in a single transaction.
+        """
+        with self.transaction():
+            self.cursor.executemany(query, batch)
+        return len(batch)
+
+    def insert_people(self,
+                      people: Iterable[Person],
+                      batch_size: int | None = None,
+                      on_batch: Callable[[int], None] | None = None) -> int:
+        """
+        Insert people into the database in batches.
+        People already in the database are skipped.
+        """
+        return self._execute_batches('''INSERT OR IGNORE INTO people
+                                     (person_number, first_name, last_name, card_number, email)
+                                     VALUES (?, ?, ?, ?, ?)''',
+                                     (self.person_row(person) for person in people),
+                                     batch_size,
+                                     on_batch)
+
+    def insert_readers(self,
+                       readers: Iterable[Reader],
+                       batch_size: int | None = None,
+                       on_batch: Callable[[int], None] | None = None) -> int:
+        """
+        Insert readers into the database in batches.
+        Readers already in the database are skipped.
+        """
+        return self._execute_batches('''INSERT OR IGNORE INTO readers
+                                     (reader_number, location_blueprint, location_hospital, location_name, abi_location)
+                                     VALUES (?, ?, ?, ?, ?)''',
+                                     (self.reader_row(reader) for reader in readers),
+                                     batch_size,
+                                     on_batch)
+
+    def insert_authorizations(self,
+                              authorizations: Iterable[tuple[Person, Reader]],
+                              batch_size: int | None = None,
+                              on_batch: Callable[[int], None] | None = None) -> int:
+        """
+        Insert (person, reader) authorization pairs into the database in batches.
+        Authorizations already in the database are skipped.
+        """
+        return self._execute_batches('''INSERT OR IGNORE INTO authorizations
+                                     (person_number, reader_number)
+                                     VALUES (?, ?)''',
+                                     ((person.person_number, reader.reader_number)
+                                      for person, reader in authorizations),
+                                     batch_size,
+                                     on_batch)
+
+    def upsert_people(self,
+                      people: Iterable[Person],
+                      batch_size: int | None = None,
+                      on_batch: Callable[[int], None] | None = None) -> int:
+        """
+        Insert new people and update existing ones whose data changed.
+        Rows with unchanged content are not rewritten.
+        Returns the number of inserted or updated rows.
+        """
+        changes = self.conn.total_changes
+        self._execute_batches('''INSERT INTO people
+                              (person_number, first_name, last_name, card_number, email)
+                              VALUES (?, ?, ?, ?, ?)
+                              ON CONFLICT(person_number) DO UPDATE SET
+                              first_name = excluded.first_name,
+                              last_name = excluded.last_name,
+                              card_number = excluded.card_number,
+                              email = excluded.email
+                              WHERE people.first_name IS NOT excluded.first_name
+                              OR people.last_name IS NOT excluded.last_name
+                              OR people.card_number IS NOT excluded.card_number
+                              OR people.email IS NOT excluded.email''',
+                              (self.person_row(person) for person in people),
+                              batch_size,
+                              on_batch)
+        return self.conn.total_changes - changes
+
+    def upsert_readers(self,
+                       readers: Iterable[Reader],
+                       batch_size: int | None = None,
+                       on_batch: Callable[[int], None] | None = None) -> int:
+        """
+        Insert new readers and update existing ones whose data changed.
+        Rows with unchanged content are not rewritten.
+        Returns the number of inserted or updated rows.
+        """
+        changes = self.conn.total_changes
+        self._execute_batches('''INSERT INTO readers
+                              (reader_number, location_blueprint, location_hospital, location_name, abi_location)
+                              VALUES (?, ?, ?, ?, ?)
+                              ON CONFLICT(reader_number) DO UPDATE SET
+                              location_blueprint = excluded.location_blueprint,
+                              location_hospital = excluded.location_hospital,
+                              location_name = excluded.location_name,
+                              abi_location = excluded.abi_location
+                              WHERE readers.location_blueprint IS NOT excluded.location_blueprint
+                              OR readers.location_hospital IS NOT excluded.location_hospital
+                              OR readers.location_name IS NOT excluded.location_name
+                              OR readers.abi_location IS NOT excluded.abi_location''',
+                              (self.reader_row(reader) for reader in readers),
+                              batch_size,
+                              on_batch)
+        return self.conn.total_changes - changes
+
+    def sync_authorizations(self,
+                            authorizations: Iterable[tuple[Person, Reader]],
+                            batch_size: int | None = None,
+                            on_batch: Callable[[int], None] | None = None,
+                            reader_numbers: Iterable[str] | None = None) -> tuple[int, int]:
+        """
+        Make the authorizations table match the given (person, reader) pairs.
+        Pairs are staged in a temporary table, then missing authorizations are inserted
+        and authorizations not present in the source are deleted in one transaction.
+        With reader_numbers only authorizations of those readers are deleted,
+        authorizations of other readers are kept.
+        Returns the number of added and removed authorizations.
+        """
+        with self.transaction():
+            self.cursor.execute('''CREATE TEMP TABLE IF NOT EXISTS source_authorizations
+                                (person_number TEXT,
+                                reader_number TEXT,
+                                PRIMARY KEY (person_number, reader_number)) WITHOUT ROWID''')
+            self.cursor.execute('''CREATE TEMP TABLE IF NOT EXISTS source_readers
+                                (reader_number TEXT PRIMARY KEY) WITHOUT ROWID''')
+            self.cursor.execute('''DELETE FROM source_authorizations''')
+            self.cursor.execute('''DELETE FROM source_readers''')
+
+        self._execute_batches('''INSERT OR IGNORE INTO source_authorizations
+                              (person_number, reader_number)
+                              VALUES (?, ?)''',
+                              ((person.person_number, reader.reader_number)
+                               for person, reader in authorizations),
+                              batch_size,
+                              on_batch)
+        if reader_numbers is not None:
+            self._execute_batches('''INSERT OR IGNORE INTO source_readers (reader_number) VALUES (?)''',
+                                  ((reader_number,) for reader_number in reader_numbers),
+                                  batch_size,
+                                  None)
+
+        restriction = ''
+        if reader_numbers is not None:
+            restriction = '''AND reader_number IN (SELECT reader_number FROM source_readers)'''
+
+        with self.transaction():
+            self.cursor.execute(f'''DELETE FROM authorizations
+                                WHERE NOT EXISTS
+                                (SELECT 1 FROM source_authorizations AS source
+                                WHERE source.person_number = authorizations.person_number
+                                AND source.reader_number = authorizations.reader_number)
+                                {restriction}''')
+            removed = self.cursor.rowcount
+            self.cursor.execute('''INSERT INTO authorizations
+                                (person_number, reader_number)
+                                SELECT person_number, reader_number FROM source_authorizations AS source
+                                WHERE NOT EXISTS
+                                (SELECT 1 FROM authorizations
+                                WHERE authorizations.person_number = source.person_number
+                                AND authorizations.reader_number = source.reader_number)''')
+            added = self.cursor.rowcount
+            self.cursor.execute('''DELETE FROM source_authorizations''')
+            self.cursor.execute('''DELETE FROM source_readers''')
+
+        return added, removed
+
+    def delete_people(self,
+                      person_numbers: Iterable[str],
+                      batch_size: int | None = None) -> int:
+        """
+        Delete people with the given numbers together with their authorizations.
+        Returns the number of deleted people.
+        """
+        person_numbers = [(person_number,) for person_number in person_numbers]
+        with self.transaction():
+            self._execute_batches('''DELETE FROM authorizations WHERE person_number = ?''',
+                                  person_numbers,
+                                  batch_size,
+                                  None)
+            changes = self.conn.total_changes
+            self._execute_batches('''DELETE FROM people WHERE person_number = ?''',
+                                  person_numbers,
+                                  batch_size,
+                                  None)
+        return self.conn.total_changes - changes
+
+    def delete_readers(self,
+                       reader_numbers: Iterable[str],
+                       batch_size: int | None = None) -> int:
+        """
+        Delete readers with the given numbers together with their authorizations.
+        Returns the number of deleted readers.
+        """
+        reader_numbers = [(reader_number,) for reader_number in reader_numbers]
+        with self.transaction():
+            self._execute_batches('''DELETE FROM authorizations WHERE reader_number = ?''',
+                                  reader_numbers,
+                                  batch_size,
+                                  None)
+            changes = self.conn.total_changes
+            self._execute_batches('''DELETE FROM readers WHERE reader_number = ?''',
+                                  reader_numbers,
+                                  batch_size,
+                                  None)
+        return self.conn.total_changes - changes
+
+    def delete_unauthorized_people(self) -> int:
+        """
+        Delete people who are not authorized for any reader, a full build does not store them.
+        Returns the number of deleted people.
+        """
+        with self.transaction():
+            self.cursor.execute('''DELETE FROM people
+                                WHERE NOT EXISTS
+                                (SELECT 1 FROM authorizations
+                                WHERE authorizations.person_number = people.person_number)''')
+        return self.cursor.rowcount
+
+    def get_snapshot(self, source: str) -> dict[str, str]:
+        """
+        Get fingerprints of rows of a source document keyed by their row keys.
+        """
+        return dict(self.iter_rows('''SELECT row_key, fingerprint FROM source_snapshot WHERE source = ?''',
+                                   (source,)))
+
+    def has_snapshot(self) -> bool:
+        """
+        Check whether fingerprints of any source document are stored.
+        """
+        self.cursor.execute('''SELECT 1 FROM source_snapshot LIMIT 1''')
+        return self.cursor.fetchone() is not None
+
+    def clear_snapshot(self) -> None:
+        """
+        Delete fingerprints of all source documents, so the next delta run maps all rows.
+        """
+        with self.transaction():
+            self.cursor.execute('''DELETE FROM source_snapshot''')
+
+    def update_snapshot(self,
+                        source: str,
+                        fingerprints: dict[str, str],
+                        removed: Iterable[str] = (),
+                        batch_size: int | None = None) -> None:
+        """
+        Store fingerprints of added or changed rows of a source document and delete removed rows.
+        """
+        self._execute_batches('''DELETE FROM source_snapshot WHERE source = ? AND row_key = ?''',
+                              ((source, row_key) for row_key in removed),
+                              batch_size,
+                              None)
+        self._execute_batches('''INSERT INTO source_snapshot (source, row_key, fingerprint)
+                              VALUES (?, ?, ?)
+                              ON CONFLICT(source, row_key) DO UPDATE SET
+                              fingerprint = excluded.fingerprint''',
+                              ((source, row_key, fingerprint)
+                               for row_key, fingerprint in fingerprints.items()),
+                              batch_size,
+                              None)
+
     def get_people(self) -> list:
         """
         Get all people from the database.
@@ -125,8 +606,216 @@ class Database:
         reader = self.cursor.fetchone()
         return reader
 
+    def iter_rows(self,
+                  query: str,
+                  parameters: tuple = (),
+                  chunk_size: int | None = None) -> Iterator[tuple]:
+        """
+        Execute the query on its own cursor and yield rows fetched in chunks,
+        so the result set is never loaded into memory at once.
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(query, parameters)
+            while True:
+                rows = cursor.fetchmany(chunk_size or self.BATCH_SIZE)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+    def iter_authorization_report(self, chunk_size: int | None = None) -> Iterator[tuple]:
+        """
+        Yield person columns followed by reader columns for every authorization.
+        Readers without authorizations are included with empty person columns.
+        """
+        return self.iter_rows(f'''SELECT authorizations.person_number,
+                              people.first_name,
+                              people.last_name,
+                              people.card_number,
+                              people.email,
+                              readers.reader_number,
+                              readers.location_blueprint,
+                              readers.location_hospital,
+                              readers.location_name,
+                              readers.abi_location
+                              {self.AUTHORIZATION_REPORT}''',
+                              chunk_size=chunk_size)
+
+    def count_authorization_report(self) -> int:
+        """
+        Count rows returned by iter_authorization_report.
+        """
+        self.cursor.execute(f'''SELECT count(*) {self.AUTHORIZATION_REPORT}''')
+        return self.cursor.fetchone()[0]
+
+    def iter_export_rows(self, chunk_size: int | None = None) -> Iterator[tuple]:
+        """
+        Yield person columns followed by reader columns for every authorization, ordered by reader.
+        Readers without authorizations come with empty person columns, then people without
+        authorizations follow with empty reader columns.
+        """
+        yield from self.iter_rows(f'''SELECT authorizations.person_number,
+                                   people.first_name,
+                                   people.last_name,
+                                   people.card_number,
+                                   people.email,
+                                   readers.reader_number,
+                                   readers.location_blueprint,
+                                   readers.location_hospital,
+                                   readers.location_name,
+                                   readers.abi_location
+                                   {self.AUTHORIZATION_REPORT}
+                                   ORDER BY readers.reader_number''',
+                                   chunk_size=chunk_size)
+        yield from self.iter_rows('''SELECT person_number, first_name, last_name, card_number, email,
+                                   NULL, NULL, NULL, NULL, NULL
+                                   FROM people
+                                   WHERE NOT EXISTS
+                                   (SELECT 1 FROM authorizations
+                                   WHERE authorizations.person_number = people.person_number)''',
+                                   chunk_size=chunk_size)
+
+    def iter_person_readers(self, chunk_size: int | None = None) -> Iterator[tuple]:
+        """
+        Yield person number, last name and space separated numbers of readers
+        the person is authorized for, one row per person.
+        """
+        return self.iter_rows('''SELECT people.person_number,
+                              people.last_name,
+                              COALESCE(group_concat(readers.reader_number || ' ', ''), '')
+                              FROM people
+                              LEFT JOIN authorizations
+                              ON authorizations.person_number = people.person_number
+                              LEFT JOIN readers
+                              ON readers.reader_number = authorizations.reader_number
+                              GROUP BY people.person_number''',
+                              chunk_size=chunk_size)
+
+    def iter_readers(self, chunk_size: int | None = None) -> Iterator[tuple]:
+        """
+        Yield all readers from the database.
+        """
+        return self.iter_rows('''SELECT * FROM readers''', chunk_size=chunk_size)
+
+    def count_readers(self) -> int:
+        """
+        Count readers in the database.
+        """
+        self.cursor.execute('''SELECT count(*) FROM readers''')
+        return self.cursor.fetchone()[0]
+
+    def count_people(self) -> int:
+        """
+        Count people in the database.
+        """
+        self.cursor.execute('''SELECT count(*) FROM people''')
+        return self.cursor.fetchone()[0]
+
+    def select_person_readers(self, person_number: str) -> list:
+        """
+        Select numbers of readers the person is authorized for.
+        """
+        self.cursor.execute('''SELECT reader_number FROM authorizations WHERE person_number = ?''',
+                            (person_number,))
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def select_reader_people(self, reader_number: str) -> list:
+        """
+        Select numbers of people authorized for the reader.
+        """
+        self.cursor.execute('''SELECT person_number FROM authorizations WHERE reader_number = ?''',
+                            (reader_number,))
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def select_people_by_card(self, card_number: str) -> list:
+        """
+        Select people with the card number.
+        """
+        self.cursor.execute('''SELECT * FROM people WHERE card_number = ?''', (card_number,))
+        return self.cursor.fetchall()
+
+    def select_people_by_email(self, email: str) -> list:
+        """
+        Select people with the email, ignoring case.
+        """
+        self.cursor.execute('''SELECT * FROM people WHERE email = ? COLLATE NOCASE''', (email,))
+        return self.cursor.fetchall()
+
+    def select_readers_by_blueprint(self, location_blueprint: str) -> list:
+        """
+        Select readers in the room with the location blueprint.
+        """
+        self.cursor.execute('''SELECT * FROM readers WHERE location_blueprint = ?''',
+                            (location_blueprint,))
+        return self.cursor.fetchall()
+
+    @classmethod
+    def staging(cls, db_name: str) -> 'Database':
+        """
+        Open a new empty staging database next to db_name, e.g. database.db.staging.
+        It is built with Database.STAGING_PRAGMAS and without secondary indexes,
+        publish moves it into place when it is complete.
+        """
+        staging_name = f'{db_name}.staging'
+        for path in (staging_name, f'{staging_name}-journal', f'{staging_name}-wal', f'{staging_name}-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+        return cls(staging_name, pragmas=cls.STAGING_PRAGMAS, defer_indexes=True)
+
+    def check_integrity(self) -> None:
+        """
+        Run SQLite integrity and foreign key checks, raise RuntimeError when they find a problem.
+        """
+        self.cursor.execute('''PRAGMA integrity_check''')
+        problems = [row[0] for row in self.cursor.fetchall() if row[0] != 'ok']
+        self.cursor.execute('''PRAGMA foreign_key_check''')
+        problems.extend(f'{row[0]} row {row[1]} references missing {row[2]}'
+                        for row in self.cursor.fetchall())
+        if problems:
+            raise RuntimeError(f'Integrity check of {self.db_name} failed: {"; ".join(problems[:10])}')
+
+    def publish(self, db_name: str) -> None:
+        """
+        Finish a staging database and copy it into db_name in a single transaction.
+        Secondary indexes are created after the bulk load and the database is checked first.
+        The live database is kept in WAL mode, so its readers never block on the rebuild.
+        The file is not renamed over db_name, connections already open on it, even idle ones,
+        see the published data in their next transaction.
+        The connection is closed, open a new Database on db_name to keep working with the data.
+        """
+        self.conn.commit()
+        self.create_indexes()
+        self.conn.commit()
+        self.check_integrity()
+        self.close()
+
+        live = sqlite3.connect(db_name)
+        try:
+            live.execute('''PRAGMA journal_mode = WAL''')
+        finally:
+            live.close()
+        copy_database(self.db_name, db_name)
+
     def close(self) -> None:
         """
         Close the database connection.
         """
         self.conn.close()
+
+
+def copy_database(source_name: str, db_name: str) -> None:
+    """
+    Copy the database source_name into db_name with the SQLite backup API and remove source_name.
+    Readers of db_name see the copy as a single transaction. Replacing the file instead would leave
+    open connections reading the unlinked old file and pair the new file with the old -wal and -shm files.
+    """
+    source = sqlite3.connect(source_name)
+    live = sqlite3.connect(db_name)
+    try:
+        source.backup(live)
+    finally:
+        live.close()
+        source.close()
+    os.remove(source_name)
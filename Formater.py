@@ -1,27 +1,68 @@
 """
 formater.py
-This module defines the change_string_format function, which formats a room number
-to a specific format.
+This module defines the LocationCodeNormalizer class, which formats room numbers
+to a specific format, and the change_string_format function using its shared instance.
 """
 import re
+from functools import lru_cache
+from typing import Iterable
 
-def change_string_format(s: str) -> str:
+
+class LocationCodeNormalizer:
     """
-    finds all occurrences of the regex pattern in the string and replaces them with the new format.
+    This class normalizes room numbers, e.g. A-PR-500 to A-PR.500.
+    Values are stripped and uppercased, so codes from different source documents
+    can be compared as exact keys. Rules are compiled once and results are memoized
+    in a bounded cache, because the same rooms repeat in every source document.
+    Values that are not strings are returned unchanged.
     """
-    pattern = re.compile(r"\b([A-Z0-9]+-[A-Z0-9]+\d*)-(\d+[a-zA-Z]?)\b")
+    # pattern of the code and the replacement built from its groups
+    RULES = (
+        (re.compile(r"\b([A-Z0-9]+-[A-Z0-9]+\d*)-(\d+[a-zA-Z]?)\b"), r"\1.\2"),
+        )
+    CACHE_SIZE = 65536
+
+    def __init__(self, cache_size: int | None = None) -> None:
+        self.normalize = lru_cache(maxsize=cache_size or self.CACHE_SIZE)(self._normalize)
+
+    def _normalize(self, s):
+        """
+        finds all occurrences of the rule patterns in the string and replaces them with the new format.
+        """
+        if not isinstance(s, str):
+            return s
 
-    if isinstance(s, str):
         s = s.strip().upper()
-        # Replace all matching patterns in the string
-        matches = pattern.findall(s)
-        for match in matches:
-            # Construct the new format using the matched groups
-            s = f"{match[0]}.{match[1]}"
+        for pattern, replacement in self.RULES:
+            # the last match replaces the whole value
+            for match in pattern.finditer(s):
+                s = match.expand(replacement)
 
         return s
 
-    return s
+    def normalize_many(self, values: Iterable) -> list:
+        """
+        normalizes a whole column of values, every distinct value is normalized once.
+        """
+        values = list(values)
+        normalized = {value: self.normalize(value) for value in set(values)}
+        return [normalized[value] for value in values]
+
+    def cache_clear(self) -> None:
+        """
+        drops memoized results.
+        """
+        self.normalize.cache_clear()
+
+
+normalizer = LocationCodeNormalizer()
+
+
+def change_string_format(s: str) -> str:
+    """
+    finds all occurrences of the regex pattern in the string and replaces them with the new format.
+    """
+    return normalizer.normalize(s)
 
 
 if __name__ == '__main__':
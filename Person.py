@@ -1,12 +1,37 @@
 """
 Person.py
 This module defines the Person class, which represents a person in a system.
-It includes all the necessary attributes that a person might have.
+It includes all the necessary attributes that a person might have
+and the NameIndex class, which finds people by names written in other source documents.
 """
+from itertools import combinations
+from typing import Iterable
+from unidecode import unidecode
+
+# academic titles written without dots, e.g. 'Ing' or 'PhD', casefolded and without diacritics
+TITLES = frozenset(('bc', 'bca', 'mgr', 'mga', 'ing', 'arch', 'mudr', 'mddr', 'mvdr', 'phdr', 'rndr',
+                    'judr', 'paeddr', 'pharmdr', 'thdr', 'thlic', 'dr', 'doc', 'prof', 'phd', 'csc',
+                    'drsc', 'dis', 'mba', 'msc', 'bsc', 'llm'))
+
+
+def name_tokens(name) -> list[str]:
+    """
+    Split a name into casefolded tokens without diacritics.
+    Titles such as 'MUDr.', 'Ph.D.' or 'Ing' and empty tokens are left out.
+    """
+    if name is None:
+        return []
+    tokens = unidecode(str(name)).casefold().replace(',', ' ').split()
+    return [token for token in tokens if '.' not in token and token not in TITLES]
+
+
 class Person:
     """
     Person class
+    People are compared and hashed by their person number, so they can be used in sets and as dict keys.
     """
+    __slots__ = ('person_number', 'first_name', 'last_name', 'card_number', 'email')
+
     def __init__(self,
                  person_number: str,
                  first_name: str = None,
@@ -26,3 +51,72 @@ class Person:
 
     def __repr__(self) -> str:
         return f'Person:{self.person_number}'
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Person):
+            return NotImplemented
+        return self.person_number == other.person_number
+
+    def __hash__(self) -> int:
+        return hash(self.person_number)
+
+
+class NameIndex:
+    """
+    NameIndex class
+    This class indexes people by their first and last name.
+    Keys do not depend on diacritics, case, titles or the order of the names, so 'Nováková Jana'
+    and 'Ing. jana novakova' find the same person. Names with extra tokens, e.g. a middle name
+    or a second surname, are resolved by the largest subset of their tokens that matches somebody,
+    but only when it matches exactly one person. 'Jana Nováková Malá' finds nobody
+    when both Jana Nováková and Jana Malá are indexed.
+    """
+    # names with more tokens are only looked up as a whole
+    MAX_TOKENS = 6
+
+    def __init__(self, people: Iterable[Person]) -> None:
+        self.index = {}
+        for person in people:
+            key = self.key(person.first_name, person.last_name)
+            if key is not None:
+                self.index.setdefault(key, []).append(person)
+
+    @staticmethod
+    def key(first_name, last_name) -> frozenset | None:
+        """
+        Return the key of a person, None when the first or the last name is missing.
+        """
+        first_tokens = name_tokens(first_name)
+        last_tokens = name_tokens(last_name)
+        if not first_tokens or not last_tokens:
+            return None
+        return frozenset(first_tokens + last_tokens)
+
+    def find(self, name) -> list[Person]:
+        """
+        Find people matching a name written as 'first last' or 'last first'.
+        All people with exactly the same name are returned.
+        Returns an empty list when nobody matches or when only parts of the name match
+        more than one person.
+        """
+        tokens = frozenset(name_tokens(name))
+        people = self.index.get(tokens)
+        if people is not None:
+            return people
+
+        if len(tokens) > self.MAX_TOKENS:
+            return []
+
+        # leave out extra tokens one by one, names rarely have more than a few of them
+        for size in range(len(tokens) - 1, 1, -1):
+            matches = []
+            for subset in combinations(tokens, size):
+                matches.extend(self.index.get(frozenset(subset), ()))
+            if matches:
+                # guessing between people would authorize the wrong one
+                return matches if len(matches) == 1 else []
+
+        return []
+
+    def __len__(self) -> int:
+        return len(self.index)
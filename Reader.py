@@ -5,11 +5,33 @@ It includes all the necessary attributes that a reader might have and all method
 """
 from person import Person
 
+
+def format_reader_number(reader_number: str) -> str:
+    """
+    Format the reader number to be 5 digits long, adding leading zeros if necessary.
+    """
+    reader_number = str(reader_number)
+    while len(reader_number) < 5:
+        reader_number = '0' + reader_number
+
+    return reader_number
+
+
 class Reader:
     """
     Reader class
     This class represents a reader in a system.
+    Readers are compared and hashed by their reader number, so they can be used in sets and as dict keys.
+    Authorized personel is kept in a dict used as an insertion-ordered set,
+    so adding, removing and checking a person takes constant time.
     """
+    __slots__ = ('reader_number',
+                 'location_blueprint',
+                 'location_hospital',
+                 'location_name',
+                 'abi_location',
+                 'authorized_personel')
+
     def __init__(self,
                  reader_number: str,
                  location_blueprint: str = None,
@@ -23,15 +45,13 @@ class Reader:
         self.location_hospital = location_hospital
         self.location_name = location_name
         self.abi_location = abi_location
-        self.authorized_personel = []
+        self.authorized_personel: dict[Person, None] = {}
 
     def format_number(self) -> str:
         """
         Format the reader number to be 5 digits long, adding leading zeros if necessary.
         """
-        while len(self.reader_number) < 5:
-            self.reader_number = '0' + self.reader_number
-
+        self.reader_number = format_reader_number(self.reader_number)
         return self.reader_number
 
     def __str__(self) -> str:
@@ -41,17 +61,83 @@ class Reader:
         return f'Reader:{self.reader_number}'
 
     def __eq__(self, other) -> bool:
+        if not isinstance(other, Reader):
+            return NotImplemented
         return self.reader_number == other.reader_number
 
+    def __hash__(self) -> int:
+        return hash(self.reader_number)
+
     def add_person(self, person: Person) -> None:
         """
         Add a person to the list of authorized personnel for this reader.
         """
-        if person not in self.authorized_personel:
-            self.authorized_personel.append(person)
+        self.authorized_personel.setdefault(person)
 
     def remove_person(self, person: Person) -> None:
         """
         Remove a person from the list of authorized personnel for this reader.
         """
-        self.authorized_personel.remove(person)
+        del self.authorized_personel[person]
+
+
+class ReaderRegistry:
+    """
+    ReaderRegistry class
+    This class indexes readers by their canonical reader number.
+    It wraps a list of readers, readers added through the registry are appended to that list
+    as well, so the list and the index stay in sync.
+    """
+    def __init__(self, readers: list[Reader] | None = None) -> None:
+        self.readers = readers if readers is not None else []
+        self.index = {}
+        for reader in self.readers:
+            self.index.setdefault(self.key(reader.reader_number), reader)
+
+    @staticmethod
+    def key(reader_number) -> str:
+        """
+        Return the canonical reader number, numbers differing only in leading zeros share a key.
+        """
+        reader_number = str(reader_number).strip()
+        if reader_number.isdigit():
+            reader_number = str(int(reader_number))
+
+        return format_reader_number(reader_number)
+
+    def get(self, reader_number) -> Reader | None:
+        """
+        Get the reader with the given number or None if it is not registered.
+        """
+        return self.index.get(self.key(reader_number))
+
+    def add(self, reader: Reader) -> Reader:
+        """
+        Register a reader, if a reader with the same number exists, the existing one is returned.
+        """
+        key = self.key(reader.reader_number)
+        if key in self.index:
+            return self.index[key]
+
+        self.index[key] = reader
+        self.readers.append(reader)
+        return reader
+
+    def get_or_create(self, reader_number) -> Reader:
+        """
+        Get the reader with the given number, creating and registering it if it does not exist.
+        """
+        reader = self.get(reader_number)
+        if reader is None:
+            reader = self.add(Reader(reader_number=self.key(reader_number)))
+
+        return reader
+
+    def __contains__(self, reader_number) -> bool:
+        return self.key(reader_number) in self.index
+
+    def __iter__(self):
+        return iter(self.readers)
+
+    def __len__(self) -> int:
+        return len(self.readers)
@@ -0,0 +1,191 @@
+"""
+benchmark.py
+This module runs the pipeline on synthetic source documents of several scales
+and records wall time, CPU time, peak memory and row counts of every stage.
+Results are written to a JSON file, which can be compared with results of an earlier benchmark.
+"""
+import argparse
+import contextlib
+import json
+import os
+from datetime import datetime
+from data_readers import ReaderMapper, PersonMapper, AuthorizationMapper, ABILocationMapper, VelinMapper
+from data_readers import source_cache, workbook_cache
+from reader import ReaderRegistry
+from database import Database
+from export_data import ExportData
+from instrumentation import recorder
+from synthetic_data import SOURCE_FILES, generate
+
+
+DEFAULT_SCALES = (1000, 10000, 100000)
+
+
+def prepare_data(directory: str, scale: int, seed: int, regenerate: bool = False) -> str:
+    """
+    This function returns the working directory of the scale, source documents are generated
+    into its source_documents directory unless they exist already.
+    """
+    working_directory = os.path.join(directory, f'scale_{scale}_seed_{seed}')
+    source_directory = os.path.join(working_directory, 'source_documents')
+    missing = not all(os.path.exists(os.path.join(source_directory, file_name))
+                      for file_name in SOURCE_FILES)
+    if regenerate or missing:
+        print(f'Generating source documents of scale {scale}...')
+        generate(source_directory, scale, seed)
+
+    return working_directory
+
+
+def run_pipeline() -> None:
+    """
+    This function maps the source documents, builds a new database and runs every export
+    in the current working directory, the same way main.py does.
+    """
+    for file_name in ('database.db', 'database.db-wal', 'database.db-shm'):
+        if os.path.exists(file_name):
+            os.remove(file_name)
+
+    readers = ReaderMapper('source_documents/export_readers.xlsx').get_readers()
+    reader_registry = ReaderRegistry(readers)
+    ABILocationMapper('source_documents/export_readers_app.xlsx', readers=reader_registry).get_readers()
+    VelinMapper('source_documents/export_readers_app.xlsx', readers=reader_registry).get_readers()
+    personel = PersonMapper('source_documents/export_employees.xlsx').get_people()
+    AuthorizationMapper('source_documents/export_efas.xlsx',
+                        readers=readers,
+                        personel=personel).get_authorizations()
+    workbook_cache.clear()
+
+    db = Database('database.db', pragmas=Database.BUILD_PRAGMAS)
+    try:
+        authorizations = [(person, reader)
+                          for reader in readers
+                          for person in reader.authorized_personel]
+        with recorder.stage('database build'):
+            with recorder.stage('insert_readers') as stage:
+                stage.rows = db.insert_readers(readers)
+            with recorder.stage('insert_people') as stage:
+                stage.rows = db.insert_people(person
+                                              for reader in readers
+                                              for person in reader.authorized_personel)
+            with recorder.stage('insert_authorizations') as stage:
+                stage.rows = db.insert_authorizations(authorizations)
+
+        export = ExportData(db)
+        for report in ExportData.REPORTS:
+            getattr(export, f'export_{report}')()
+        export.export_all()
+    finally:
+        db.close()
+
+
+def run_scale(directory: str, scale: int, seed: int, regenerate: bool, verbose: bool) -> dict:
+    """
+    This function runs the pipeline on one scale and returns its run report.
+    """
+    working_directory = prepare_data(directory, scale, seed, regenerate)
+    current_directory = os.getcwd()
+    os.chdir(working_directory)
+    recorder.reset()
+    try:
+        if verbose:
+            run_pipeline()
+        else:
+            with open(os.devnull, 'w', encoding='utf-8') as devnull, \
+                    contextlib.redirect_stdout(devnull):
+                run_pipeline()
+    finally:
+        os.chdir(current_directory)
+
+    report = recorder.report()
+    report['scale'] = scale
+    report['seed'] = seed
+    return report
+
+
+def compare(results: dict, baseline: dict) -> None:
+    """
+    This function prints wall times of stages next to the wall times of the same stages
+    in the baseline results.
+    """
+    baseline_scales = {str(scale['scale']): scale for scale in baseline['scales']}
+    for scale in results['scales']:
+        previous = baseline_scales.get(str(scale['scale']))
+        if previous is None:
+            continue
+        previous_times = {}
+        for stage in previous['stages']:
+            previous_times.setdefault(stage['name'], []).append(stage['wall_time_s'])
+
+        print(f'\nScale {scale["scale"]} compared to {baseline["started"]}:')
+        for stage in scale['stages']:
+            times = previous_times.get(stage['name'])
+            if not times:
+                continue
+            before = times.pop(0)
+            ratio = stage['wall_time_s'] / before if before else float('inf')
+            print(f'{"  " * stage["depth"]}{stage["name"]}: '
+                  f'{before:.3f} s -> {stage["wall_time_s"]:.3f} s ({ratio:.2f}x)')
+
+
+def print_report(report: dict) -> None:
+    """
+    This function prints stages of a run report as a table.
+    """
+    print(f'\nScale {report["scale"]}: {report["wall_time_s"]:.2f} s, '
+          f'peak RSS {report["peak_rss_kb"]} kB')
+    for stage in report['stages']:
+        rows = stage['rows'] if stage['rows'] is not None else '-'
+        print(f'{"  " * stage["depth"]}{stage["name"]}: {stage["wall_time_s"]:.3f} s wall, '
+              f'{stage["cpu_time_s"]:.3f} s cpu, {rows} rows')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline on synthetic source documents.')
+    parser.add_argument('--scales',
+                        type=int,
+                        nargs='+',
+                        default=list(DEFAULT_SCALES),
+                        help='numbers of readers and employees to benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic data')
+    parser.add_argument('--data-dir',
+                        default='benchmark_data',
+                        help='directory for generated source documents, databases and exports')
+    parser.add_argument('--regenerate',
+                        action='store_true',
+                        help='generate source documents even if they exist')
+    parser.add_argument('--output',
+                        default=None,
+                        help='path of the JSON results, '
+                             'defaults to benchmark_results/benchmark_<start time>.json')
+    parser.add_argument('--compare', default=None, help='JSON results of an earlier benchmark')
+    parser.add_argument('--source-cache',
+                        action='store_true',
+                        help='load unchanged source documents from the persistent cache '
+                             'instead of measuring their parsing')
+    parser.add_argument('--verbose', action='store_true', help='show output of the pipeline')
+    args = parser.parse_args()
+    source_cache.enabled = args.source_cache
+
+    started = datetime.now()
+    results = {'started': started.isoformat(timespec='seconds'), 'scales': []}
+    for benchmark_scale in args.scales:
+        scale_report = run_scale(args.data_dir,
+                                 benchmark_scale,
+                                 args.seed,
+                                 args.regenerate,
+                                 args.verbose)
+        results['scales'].append(scale_report)
+        print_report(scale_report)
+
+    output = args.output or os.path.join('benchmark_results',
+                                         f'benchmark_{started:%Y%m%d_%H%M%S}.json')
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    print(f'\nResults saved to {output}')
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            compare(results, json.load(file))
@@ -3,11 +3,325 @@ data_readers.py
 This module defines the DataReader class and its subclasses, which are responsible for reading data
 from Excel files. And mapping the data to the appropriate classes.
 """
-from typing import Iterator
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator
 import openpyxl as opx
-from reader import Reader
-from person import Person
-from formater import change_string_format
+from reader import Reader, ReaderRegistry
+from person import Person, NameIndex
+from formater import normalizer
+from progress import Progress
+from instrumentation import instrumented
+from export_writers import get_writer
+
+
+class SourceCache:
+    """
+    This class is a persistent cache of parsed workbooks stored in an SQLite database.
+    Entries are keyed on the absolute path of the file, the SHA-256 hash of its contents
+    and the parsed columns, so an entry is used only for the very same file and a file
+    that changed is parsed again. Entries of older contents of the same file are removed
+    when a new entry is stored.
+    Rows are stored as JSON, loading an entry never executes code, whoever wrote the cache.
+    """
+    DIRECTORY = 'source_cache'
+    FILE_NAME = 'sources.db'
+    # bump when the format of parsed rows changes, so old entries are not used
+    VERSION = 2
+    # types of cell values JSON does not have, stored as {type name: ISO format}
+    TEMPORAL_TYPES = {'datetime': datetime.datetime, 'date': datetime.date, 'time': datetime.time}
+
+    def __init__(self, directory: str | None = None, enabled: bool = True) -> None:
+        self.directory = directory or self.DIRECTORY
+        self.enabled = enabled
+        self.digests = {}
+
+    def digest(self, file_path: str) -> str:
+        """
+        This method returns the SHA-256 hash of the file contents,
+        it is hashed again only when its modification time or size changed.
+        """
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+        if key not in self.digests:
+            file_hash = hashlib.sha256()
+            with open(file_path, 'rb') as file:
+                for chunk in iter(lambda: file.read(1 << 20), b''):
+                    file_hash.update(chunk)
+            self.digests[key] = file_hash.hexdigest()
+
+        return self.digests[key]
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        This method opens the cache database, entries of other versions are dropped.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(self.directory, self.FILE_NAME), timeout=30)
+        try:
+            if conn.execute('''PRAGMA user_version''').fetchone()[0] != self.VERSION:
+                with conn:
+                    conn.execute('''DROP TABLE IF EXISTS entries''')
+                    conn.execute('''CREATE TABLE entries
+                                 (path TEXT NOT NULL,
+                                 digest TEXT NOT NULL,
+                                 columns TEXT NOT NULL,
+                                 rows TEXT NOT NULL,
+                                 PRIMARY KEY (path, digest, columns))''')
+                    conn.execute(f'''PRAGMA user_version = {self.VERSION}''')
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def encode(self, value):
+        """
+        This method converts a cell value JSON does not support, used as json.dumps default.
+        """
+        for name, value_type in self.TEMPORAL_TYPES.items():
+            if type(value) is value_type: # pylint: disable=C0123
+                return {name: value.isoformat()}
+        if isinstance(value, datetime.timedelta):
+            return {'timedelta': value.total_seconds()}
+        raise TypeError(f'Cannot cache cell value of type {type(value).__name__}')
+
+    def decode(self, value: dict):
+        """
+        This method restores a cell value converted by encode, used as json.loads object_hook.
+        """
+        (name, encoded), = value.items()
+        if name == 'timedelta':
+            return datetime.timedelta(seconds=encoded)
+        return self.TEMPORAL_TYPES[name].fromisoformat(encoded)
+
+    def load(self, file_path: str, columns: list[int]) -> tuple[tuple[int, ...], list[tuple]] | None:
+        """
+        This method returns cached columns and rows of the file, None when no entry
+        of the current file contents covers all requested columns.
+        """
+        if not self.enabled or not os.path.exists(os.path.join(self.directory, self.FILE_NAME)):
+            return None
+
+        digest = self.digest(file_path)
+        try:
+            conn = self.connect()
+            try:
+                entries = conn.execute('''SELECT columns, rows FROM entries
+                                       WHERE path = ? AND digest = ?''',
+                                       (os.path.abspath(file_path), digest)).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError:
+            # a damaged or locked cache is a miss, the file is parsed again
+            return None
+
+        for entry_columns, rows in entries:
+            entry_columns = tuple(int(column) for column in entry_columns.split(','))
+            if set(columns) <= set(entry_columns):
+                try:
+                    return entry_columns, [tuple(row) for row in json.loads(rows, object_hook=self.decode)]
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+        return None
+
+    def store(self, file_path: str, columns: list[int], rows: list[tuple]) -> None:
+        """
+        This method writes parsed rows of the file to the cache
+        and removes entries of its older contents.
+        """
+        if not self.enabled:
+            return
+
+        path = os.path.abspath(file_path)
+        digest = self.digest(file_path)
+        columns = ','.join(str(column) for column in sorted(set(columns)))
+        payload = json.dumps(rows, default=self.encode, ensure_ascii=False, separators=(',', ':'))
+        try:
+            conn = self.connect()
+            try:
+                with conn:
+                    conn.execute('''DELETE FROM entries WHERE path = ? AND digest != ?''', (path, digest))
+                    conn.execute('''INSERT OR REPLACE INTO entries (path, digest, columns, rows)
+                                 VALUES (?, ?, ?, ?)''',
+                                 (path, digest, columns, payload))
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError as error:
+            # the run does not depend on the cache, the file is parsed again next time
+            print(f'Could not cache {file_path}: {error}')
+
+
+source_cache = SourceCache()
+
+
+class WorkbookCache:
+    """
+    This class is a process-level cache of parsed workbooks.
+    Entries are keyed on file path, modification time and size, so a file that changed on disk
+    is parsed again. Every entry holds rows for the union of all columns requested from the file
+    and each caller gets its own projection of those rows.
+    Files missing in the cache are loaded from source_cache before they are parsed.
+    """
+    def __init__(self) -> None:
+        self.entries = {}
+        self.declared = {}
+
+    @staticmethod
+    def signature(file_path: str) -> tuple:
+        """
+        This method returns the path, modification time and size identifying the file contents.
+        """
+        stat = os.stat(file_path)
+        return os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size
+
+    def declare(self, file_path: str, columns: list[int]) -> None:
+        """
+        This method announces columns that will be requested from the file,
+        so that the first parse already covers all of them.
+        """
+        self.declared.setdefault(os.path.abspath(file_path), set()).update(columns)
+
+    def get(self,
+            file_path: str,
+            columns: list[int],
+            parse: Callable[[list[int]], list]) -> list[list]:
+        """
+        This method returns rows of the requested columns.
+        The file is parsed with the parse callable only when neither this cache nor source_cache
+        holds its current contents with all of the columns.
+        """
+        key = os.path.abspath(file_path)
+        signature = self.signature(file_path)
+        entry = self.entries.get(key)
+
+        if entry is None or entry[0] != signature or not set(columns) <= set(entry[1]):
+            union = set(columns) | self.declared.get(key, set())
+            if entry is not None and entry[0] == signature:
+                union |= set(entry[1])
+            union = sorted(union)
+            cached = source_cache.load(file_path, union)
+            if cached is not None:
+                entry = (signature, *cached)
+            else:
+                rows = [tuple(row) for row in parse(union)]
+                source_cache.store(file_path, union, rows)
+                entry = (signature, tuple(union), rows)
+            self.entries[key] = entry
+
+        return self.project(entry[1], entry[2], columns)
+
+    def put(self, file_path: str, columns: list[int], rows: list, signature: tuple) -> None:
+        """
+        This method stores rows parsed elsewhere, e.g. in a worker process.
+        The signature must be taken before the file was parsed.
+        """
+        self.entries[os.path.abspath(file_path)] = (signature,
+                                                    tuple(sorted(set(columns))),
+                                                    [tuple(row) for row in rows])
+
+    @staticmethod
+    def project(cached_columns: tuple, rows: list[tuple], columns: list[int]) -> list[list]:
+        """
+        This method returns new row lists containing only the requested columns.
+        """
+        positions = [cached_columns.index(column) for column in sorted(set(columns))]
+        return [[row[position] for position in positions] for row in rows]
+
+    def clear(self) -> None:
+        """
+        This method drops all cached workbooks.
+        """
+        self.entries.clear()
+        self.declared.clear()
+
+
+workbook_cache = WorkbookCache()
+
+
+def project_rows(sheet, columns: list[int]) -> Iterator[list]:
+    """
+    This function yields values of the requested columns for every row of the sheet.
+    Only the range between the first and the last requested column is read.
+    """
+    columns = sorted(set(columns))
+    first_column = columns[0]
+    offsets = [column - first_column for column in columns]
+
+    for values in sheet.iter_rows(min_col=first_column,
+                                  max_col=columns[-1],
+                                  values_only=True):
+        data_row = []
+        for offset in offsets:
+            value = values[offset] if offset < len(values) else None
+            if isinstance(value, str):
+                data_row.append(value.strip())
+            else:
+                data_row.append(value)
+
+        yield data_row
+
+
+def parse_workbook(file_path: str, columns: list[int]) -> list[tuple]:
+    """
+    This function parses the requested columns of the Excel file into a list of row tuples.
+    It is a module level function, so it can run in a worker process.
+    """
+    workbook = opx.load_workbook(file_path, read_only=True)
+    try:
+        return [tuple(row) for row in project_rows(workbook.active, columns)]
+    finally:
+        workbook.close()
+
+
+def ingest_sources(sources: Iterable[tuple[str, Iterable[int]]],
+                   max_workers: int | None = None) -> None:
+    """
+    This function parses source workbooks in parallel worker processes
+    and stores their rows in workbook_cache.
+    Columns requested for the same file are merged, so every file is parsed once.
+    Files whose contents did not change since they were parsed last time are loaded
+    from source_cache instead.
+    Mappers created afterwards take their rows from the cache instead of parsing the files.
+    """
+    requested = {}
+    for file_path, columns in sources:
+        requested.setdefault(file_path, set()).update(columns)
+
+    signatures = {file_path: WorkbookCache.signature(file_path) for file_path in requested}
+    for file_path in list(requested):
+        cached = source_cache.load(file_path, requested[file_path])
+        if cached is not None:
+            print(f'Loaded {file_path} from cache.')
+            workbook_cache.put(file_path, cached[0], cached[1], signatures[file_path])
+            del requested[file_path]
+    if not requested:
+        return
+
+    if max_workers is None:
+        max_workers = min(len(requested), os.cpu_count() or 1)
+
+    print(f'Reading {len(requested)} source files with {max_workers} workers...')
+    if max_workers <= 1:
+        for file_path, columns in requested.items():
+            rows = parse_workbook(file_path, sorted(columns))
+            source_cache.store(file_path, columns, rows)
+            workbook_cache.put(file_path, columns, rows, signatures[file_path])
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {file_path: executor.submit(parse_workbook, file_path, sorted(columns))
+                       for file_path, columns in requested.items()}
+            for file_path, future in futures.items():
+                rows = future.result()
+                source_cache.store(file_path, requested[file_path], rows)
+                workbook_cache.put(file_path, requested[file_path], rows, signatures[file_path])
+
+    print('Source files read.\n')
+
 
 class DataReader:
     """
@@ -15,53 +329,91 @@ class DataReader:
     It uses the openpyxl library to read the data and map it to the appropriate classes.
     It is a base class for the ReaderMapper, PersonMapper, AuthorizationMapper,
     and ABILocationMapper classes.
+    Workbooks are opened in read-only mode and only the requested columns are projected.
+    With stream=True rows are not stored in the data attribute, they are yielded lazily
+    from the workbook while the mapper consumes them.
+    Otherwise rows are shared through workbook_cache, so a file read by several mappers
+    is parsed only once per run.
     """
-    def __init__(self, file_path: str, columns: list[int] | None) -> None:
+    def __init__(self, file_path: str, columns: list[int] | None, stream: bool = False) -> None:
         self.file_path = file_path
         self.data = []
         self.columns = columns
+        self.stream = stream
+        self.row_count = 0
+
+    def _open_sheet(self) -> tuple:
+        """
+        This method opens the workbook in read-only mode and returns it with its active sheet.
+        """
+        workbook = opx.load_workbook(self.file_path, read_only=True)
+        return workbook, workbook.active
 
+    @instrumented('read_data {self.file_path}', rows=lambda self, data: len(data))
     def read_data(self) -> list:
         """
         This method reads data from the Excel file and stores it in the data attribute.
         """
-        self.data = []
-        data = opx.load_workbook(self.file_path)
-        sheet = data.active
-
         print(f'Reading data from {self.file_path}...')
-        progress = 0
-        complete = sheet.max_row
-        for row in sheet.rows:
-            progress += 1
-            print(
-                f"Progress: {'█'*(progress//(complete // 10))}{' '*(10-progress//(complete // 10))} {progress}/{complete}", end="\r") # pylint: disable=C0301
-            data_row = []
-            for cell in row:
-                if cell.column in self.columns:
-                    if isinstance(cell.value, str):
-                        data_row.append(cell.value.strip())
-                    else:
-                        data_row.append(cell.value)
-
-            self.data.append(data_row)
-
+        self.data = workbook_cache.get(self.file_path, self.columns, self._parse)
+        self.row_count = len(self.data)
         print('Data read complete.\n')
         return self.data
 
+    def _parse(self, columns: list[int]) -> list:
+        """
+        This method parses the requested columns of the Excel file into a list of rows.
+        """
+        workbook, sheet = self._open_sheet()
+        try:
+            with Progress(self.file_path, sheet.max_row) as progress:
+                return list(progress.iter(project_rows(sheet, columns)))
+        finally:
+            workbook.close()
+
+    def iter_rows(self) -> Iterator[list]:
+        """
+        This method returns a generator that yields rows straight from the Excel file
+        without storing them in the data attribute.
+        The workbook is opened right away, so row_count is known before iteration starts.
+        """
+        workbook, sheet = self._open_sheet()
+        self.row_count = sheet.max_row or 0
+
+        def generate_rows() -> Iterator[list]:
+            try:
+                yield from project_rows(sheet, self.columns)
+            finally:
+                workbook.close()
+
+        return generate_rows()
+
+    def rows(self) -> Iterator[list]:
+        """
+        This method returns an iterator over the rows mappers should consume.
+        In stream mode rows are read lazily from the file, otherwise the stored data is used.
+        """
+        if self.stream:
+            return self.iter_rows()
+        return iter(self.data)
+
 
 class ReaderMapper(DataReader):
     """
     This class is responsible for mapping data from the Excel file to the Reader class.
     It inherits from the DataReader class and uses the map_data method to map the data.
     """
-    def __init__(self, file_path:str, columns=None) -> None:
+    DEFAULT_COLUMNS = (2, 3, 4)
+
+    def __init__(self, file_path:str, columns=None, stream: bool = False) -> None:
         if columns is None:
-            columns = [2, 3, 4]
-        super().__init__(file_path, columns)
-        self.read_data()
+            columns = list(self.DEFAULT_COLUMNS)
+        super().__init__(file_path, columns, stream)
+        if not stream:
+            self.read_data()
 
 
+    @instrumented('map_data {self.__class__.__name__}', rows=lambda self, _: self.row_count)
     def map_data(self) -> list:
         """
         This method maps the data to the Reader class.
@@ -71,17 +423,14 @@ class ReaderMapper(DataReader):
 
         print('Mapping data...')
 
-        progress = 0
-        complete = len(self.data)
-        for row in self.data:
-            progress += 1
-            print(
-                f"Progress: {'█'*(progress//(complete // 10))}{' '*(10-progress//(complete // 10))} {progress}/{complete}", end="\r") # pylint: disable=C0301
-            reader = Reader(reader_number=str(row[0]),
-                            location_blueprint=change_string_format(row[1]),
-                            location_name=row[2])
-            reader.format_number()
-            readers.append(reader)
+        rows = self.rows()
+        with Progress(type(self).__name__, self.row_count) as progress:
+            for row in progress.iter(rows):
+                reader = Reader(reader_number=str(row[0]),
+                                location_blueprint=normalizer.normalize(row[1]),
+                                location_name=row[2])
+                reader.format_number()
+                readers.append(reader)
 
         print('Data mapped.\n')
         return readers
@@ -98,12 +447,19 @@ class PersonMapper(DataReader):
     This class is responsible for mapping data from the Excel file to the Person class.
     It inherits from the DataReader class and uses the map_data method to map the data.
     """
-    def __init__(self, file_path:str, columns:list[int] | None=None) -> None:
+    DEFAULT_COLUMNS = (1, 2, 3, 4, 6)
+
+    def __init__(self,
+                 file_path:str,
+                 columns:list[int] | None=None,
+                 stream: bool = False) -> None:
         if columns is None:
-            columns = [1,2,3,4,6]
-        super().__init__(file_path, columns)
-        self.read_data()
+            columns = list(self.DEFAULT_COLUMNS)
+        super().__init__(file_path, columns, stream)
+        if not stream:
+            self.read_data()
 
+    @instrumented('map_data {self.__class__.__name__}', rows=lambda self, _: self.row_count)
     def map_data(self) -> list:
         """
         This method maps the data to the Person class.
@@ -113,18 +469,15 @@ class PersonMapper(DataReader):
 
         print('Mapping data...')
 
-        progress = 0
-        complete = len(self.data)
-        for row in self.data:
-            progress += 1
-            print(
-                f"Progress: {'█'*(progress//(complete // 10))}{' '*(10-progress//(complete // 10))} {progress}/{complete}", end="\r") # pylint: disable=C0301
-            person = Person(person_number=row[0],
-                            first_name=row[3],
-                            last_name=row[2],
-                            card_number=row[4],
-                            email=row[1])
-            people.append(person)
+        rows = self.rows()
+        with Progress(type(self).__name__, self.row_count) as progress:
+            for row in progress.iter(rows):
+                person = Person(person_number=row[0],
+                                first_name=row[3],
+                                last_name=row[2],
+                                card_number=row[4],
+                                email=row[1])
+                people.append(person)
 
         print('Data mapped.\n')
         return people
@@ -143,18 +496,24 @@ class AuthorizationMapper(DataReader):
     It inherits from the DataReader class and uses the map_data method to map the data.
     It requires a list of readers and personel objects to initialize.
     """
+    DEFAULT_COLUMNS = (1, 2, 3, 4, 5, 6)
+
     def __init__(self,
                  file_path:str,
                  readers:list[Reader],
                  personel:list[Person],
-                 columns:list[int] | None=None) -> None:
+                 columns:list[int] | None=None,
+                 stream: bool = False) -> None:
 
         if columns is None:
-            columns = [1,2,3,4,5,6]
-        super().__init__(file_path, columns)
-        self.read_data()
+            columns = list(self.DEFAULT_COLUMNS)
+        super().__init__(file_path, columns, stream)
+        if not stream:
+            self.read_data()
         self.readers = readers
         self.personel = personel
+        # names of supervisors not found among people, with blueprints of the rooms they were listed at
+        self.unmatched_names = {}
 
     def person_gen(self) -> Iterator[Person]:
         """
@@ -170,35 +529,73 @@ class AuthorizationMapper(DataReader):
         for reader in self.readers:
             yield reader
 
+    def reader_index(self) -> dict[str, list[Reader]]:
+        """
+        This method builds a multimap of normalized location blueprints to readers.
+        Readers without a location blueprint are left out.
+        """
+        index = {}
+        readers = list(self.reader_gen())
+        blueprints = normalizer.normalize_many(reader.location_blueprint for reader in readers)
+        for reader, blueprint in zip(readers, blueprints):
+            if blueprint is not None:
+                index.setdefault(blueprint, []).append(reader)
+
+        return index
+
+    def person_index(self) -> NameIndex:
+        """
+        This method builds an index of people by their names,
+        ignoring diacritics, case, the order of the names and titles.
+        """
+        return NameIndex(self.person_gen())
+
+    @instrumented('map_data {self.__class__.__name__}', rows=lambda self, _: self.row_count)
     def map_data(self) -> list:
         """
         This method maps the data to the Reader and Person classes.
         It iterates through the data and assigns the appropriate values to the reader
         and person objects.
+        Readers and people are indexed once, so every row is resolved with dictionary lookups.
+        Kod projekt is normalized the same way as reader blueprints, so they are compared as exact keys.
+        Names that match nobody, or only partly match several people, are not authorized,
+        they are collected in the unmatched_names attribute.
         """
         print('Mapping data...')
 
-        progress = 0
-        complete = len(self.data)
-        for row in self.data:
-            progress += 1
-            print(
-                f"Progress: {'█'*(progress//(complete // 10))}{' '*(10-progress//(complete // 10))} {progress}/{complete}", end="\r")  # pylint: disable=C0301
-            for reader in self.readers:
-                if str(reader.location_blueprint).strip() == str(row[3]).strip() and reader.location_blueprint is not None:  # pylint: disable=C0301
+        readers_by_blueprint = self.reader_index()
+        people_by_name = self.person_index()
+        self.unmatched_names = {}
+
+        rows = self.rows()
+        with Progress(type(self).__name__, self.row_count) as progress:
+            for row in progress.iter(rows):
+                blueprint = normalizer.normalize(row[3])
+                readers = readers_by_blueprint.get(blueprint)
+                if not readers:
+                    continue
+
+                personel = []
+                for name in (row[4], row[5]):
+                    if name is None or not str(name).strip():
+                        continue
+                    people = people_by_name.find(name)
+                    if not people:
+                        self.unmatched_names.setdefault(str(name), []).append(str(blueprint))
+                    personel.extend(people)
+
+                for reader in readers:
                     reader.location_hospital = str(row[0])
                     if row[2] is not None:
                         reader.location_name = f'{row[1]} ({row[2]})'
                     else:
                         reader.location_name = row[1]
-                    personel = str(row[4]).casefold().split(), str(row[5]).casefold().split()
 
                     for person in personel:
-                        if person != 'None':
-                            for p in self.person_gen():
-                                if set((p.first_name.casefold(), p.last_name.casefold())) == set(person): # pylint: disable=C0301
-                                    reader.add_person(p)
+                        reader.add_person(person)
 
+        if self.unmatched_names:
+            print(f'{len(self.unmatched_names)} names were not found among people.')
         print('Data mapped.\n')
         return self.readers
 
@@ -209,32 +606,59 @@ class AuthorizationMapper(DataReader):
         """
         return self.map_data()
 
+    def export_unmatched(self,
+                         path: str = 'output_documents/UnmatchedNamesOutput',
+                         output_format: str = 'xlsx') -> str:
+        """
+        This method writes names that were not found among people, the number of rows
+        they were listed in and blueprints of those rooms, and returns the path of the file.
+        """
+        writer = get_writer(output_format)
+        with writer(f'{path}.{writer.extension}', ['Name', 'Rows', 'Location Blueprints']) as output:
+            for name in sorted(self.unmatched_names):
+                blueprints = self.unmatched_names[name]
+                output.write([name, len(blueprints), ' '.join(dict.fromkeys(blueprints))])
+
+        return output.path
+
 
 class ABILocationMapper(DataReader):
     """
     This class is responsible for mapping data from the Excel file to the Reader class.
     It inherits from the DataReader class and uses the map_data method to map the data.
+    Readers can be passed as a list or as a ReaderRegistry shared with other mappers.
     """
-    def __init__(self, file_path:str, readers:list[Reader], columns:list[int] | None=None) -> None:
-        if columns is None:
-            columns = [2, 5]
-        super().__init__(file_path, columns)
-        self.read_data()
-        self.readers = readers
+    DEFAULT_COLUMNS = (2, 5)
 
+    def __init__(self,
+                 file_path:str,
+                 readers:list[Reader] | ReaderRegistry,
+                 columns:list[int] | None=None,
+                 stream: bool = False) -> None:
+        if columns is None:
+            columns = list(self.DEFAULT_COLUMNS)
+        super().__init__(file_path, columns, stream)
+        if not stream:
+            self.read_data()
+        if not isinstance(readers, ReaderRegistry):
+            readers = ReaderRegistry(readers)
+        self.registry = readers
+        self.readers = readers.readers
+
+    @instrumented('map_data {self.__class__.__name__}', rows=lambda self, _: self.row_count)
     def map_data(self) -> list:
         """
         This method maps the data to the Reader class.
         """
         print('Mapping data...')
-        progress = 0
-        complete = len(self.data)
-        for row in self.data:
-            progress += 1
-            print(
-                f"Progress: {'█'*(progress//(complete // 10))}{' '*(10-progress//(complete // 10))} {progress}/{complete}", end="\r") # pylint: disable=C0301
-            for reader in self.readers:
-                if int(reader.reader_number) == int(row[0]):
+        rows = self.rows()
+        with Progress(type(self).__name__, self.row_count) as progress:
+            for row in progress.iter(rows):
+                if row[0] is None:
+                    continue
+
+                reader = self.registry.get(row[0])
+                if reader is not None:
                     reader.abi_location = row[1]
 
         print('Data mapped.\n')
@@ -251,46 +675,40 @@ class VelinMapper(DataReader):
     """
     This class is responsible for mapping data from the Excel file to the Reader class.
     It inherits from the DataReader class and uses the map_data method to map the data.
+    Readers can be passed as a list or as a ReaderRegistry shared with other mappers.
     """
+    DEFAULT_COLUMNS = (2,)
+
     def __init__(self,
                  file_path: str,
-                 readers: list[Reader],
-                 columns: list[int] | None = None) -> None:
+                 readers: list[Reader] | ReaderRegistry,
+                 columns: list[int] | None = None,
+                 stream: bool = False) -> None:
 
         if columns is None:
-            columns = [2]
-        super().__init__(file_path, columns)
-        self.read_data()
-        self.readers = readers
-
+            columns = list(self.DEFAULT_COLUMNS)
+        super().__init__(file_path, columns, stream)
+        if not stream:
+            self.read_data()
+        if not isinstance(readers, ReaderRegistry):
+            readers = ReaderRegistry(readers)
+        self.registry = readers
+        self.readers = readers.readers
+
+    @instrumented('map_data {self.__class__.__name__}', rows=lambda self, _: self.row_count)
     def map_data(self) -> list:
         """
         This method maps the data to the Reader class.
         It creates a new reader if not found in list instance was initialized with.
-        It iterates through the data and assigns the appropriate values to the readers.
+        New readers are registered immediately, so repeated rows do not create duplicates.
         """
         print('Mapping data...')
-        progress = 0
-        complete = len(self.data)
-        for row in self.data:
-            reader_found = False
-            # add readers that are not in authorizations
-            progress += 1
-            print(
-                f"Progress: {'█'*(progress//(complete // 10))}{' '*(10-progress//(complete // 10))} {progress}/{complete}", end="\r") # pylint: disable=C0301
-
-            if len(row[0]) < 5:
-                row[0] = f'0{row[0]}'
-
-            for reader in self.readers:
-                if int(reader.reader_number) == int(row[0]):
-                    reader_found = True
-                    break
-
-            if not reader_found:
-                reader = Reader(reader_number=row[0])
-                self.readers.append(reader)
-
+        rows = self.rows()
+        with Progress(type(self).__name__, self.row_count) as progress:
+            for row in progress.iter(rows):
+                # add readers that are not in authorizations
+                if row[0] is not None:
+                    self.registry.get_or_create(row[0])
 
         print('Data mapped.\n')
         return self.readers
@@ -0,0 +1,261 @@
+"""
+delta.py
+This module defines the DeltaPipeline class, which updates the database only with the parts
+of source documents that changed since the previous run.
+Every normalized source row is fingerprinted and compared with the snapshot stored in the database,
+only readers and rooms affected by added, removed or changed rows are mapped again.
+"""
+import hashlib
+import os
+from typing import Callable, Iterable
+from data_readers import ReaderMapper, PersonMapper, AuthorizationMapper, ABILocationMapper, VelinMapper
+from reader import ReaderRegistry
+from person import NameIndex, name_tokens
+from formater import normalizer
+from database import Database
+from instrumentation import instrumented, recorder
+
+
+def fingerprint_rows(rows: Iterable,
+                     key: Callable,
+                     normalize: Callable) -> dict[str, str]:
+    """
+    This function returns fingerprints of normalized rows keyed by their row keys.
+    Rows sharing a key get one fingerprint of all of them, rows without a key are left out.
+    """
+    grouped = {}
+    for row in rows:
+        row_key = key(row)
+        if row_key is not None:
+            grouped.setdefault(row_key, []).append(repr(normalize(row)))
+
+    return {row_key: hashlib.blake2b('\n'.join(sorted(values)).encode('utf-8'),
+                                     digest_size=16).hexdigest()
+            for row_key, values in grouped.items()}
+
+
+def reader_key(row) -> str | None:
+    """
+    This function returns the canonical reader number of a row starting with a reader number.
+    """
+    return ReaderRegistry.key(row[0]) if row[0] is not None else None
+
+
+def room_key(row) -> str | None:
+    """
+    This function returns the normalized location blueprint of an EFAS row.
+    """
+    return normalizer.normalize(row[3])
+
+
+class SourceDelta:
+    """
+    This class holds row keys of one source document that were added, removed or changed
+    since the snapshot was taken, and fingerprints of the current rows.
+    """
+    def __init__(self, source: str, snapshot: dict[str, str], fingerprints: dict[str, str]) -> None:
+        self.source = source
+        self.fingerprints = fingerprints
+        self.added = fingerprints.keys() - snapshot.keys()
+        self.removed = snapshot.keys() - fingerprints.keys()
+        self.changed = {row_key for row_key in fingerprints.keys() & snapshot.keys()
+                        if fingerprints[row_key] != snapshot[row_key]}
+
+    @property
+    def keys(self) -> set[str]:
+        """
+        This property returns keys of all added, removed and changed rows.
+        """
+        return self.added | self.removed | self.changed
+
+    def updates(self) -> dict[str, str]:
+        """
+        This method returns fingerprints of added and changed rows.
+        """
+        return {row_key: self.fingerprints[row_key] for row_key in self.added | self.changed}
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def __str__(self) -> str:
+        return (f'{self.source}: {len(self.added)} added, {len(self.removed)} removed, '
+                f'{len(self.changed)} changed')
+
+
+class DeltaPipeline:
+    """
+    This class maps and stores only the parts of source documents that changed.
+    Readers are affected when their row in export_readers.xlsx or export_readers_app.xlsx changed,
+    when the EFAS row of their room changed or when an employee they authorize changed.
+    Rooms are affected when their EFAS row changed, when a reader in them is affected
+    or when a changed employee matches one of their supervisors.
+    People are always mapped, because every affected room resolves its supervisors among all of them.
+    Readers and employees removed from the source documents are deleted, as are people
+    left without authorizations, so the database matches a full build.
+    All database changes, including the new snapshot, are applied in one transaction.
+    Without a snapshot in the database all rows are mapped and authorizations are fully synchronized.
+    """
+    def __init__(self, db: Database, source_directory: str = 'source_documents') -> None:
+        self.db = db
+        self.registry = ReaderRegistry()
+        self.people = []
+
+        self.reader_mapper = ReaderMapper(os.path.join(source_directory, 'export_readers.xlsx'))
+        self.abi_location_mapper = ABILocationMapper(
+            os.path.join(source_directory, 'export_readers_app.xlsx'), readers=self.registry)
+        self.velin_mapper = VelinMapper(os.path.join(source_directory, 'export_readers_app.xlsx'),
+                                        readers=self.registry)
+        self.person_mapper = PersonMapper(os.path.join(source_directory, 'export_employees.xlsx'))
+        # readers and people are filled in when they are mapped
+        self.authorization_mapper = AuthorizationMapper(
+            os.path.join(source_directory, 'export_efas.xlsx'),
+            readers=self.registry.readers,
+            personel=self.people)
+
+    def fingerprints(self) -> dict[str, dict[str, str]]:
+        """
+        This method returns fingerprints of normalized rows of every source document.
+        """
+        return {
+            'readers': fingerprint_rows(
+                self.reader_mapper.data,
+                reader_key,
+                lambda row: (row[0], normalizer.normalize(row[1]), row[2])),
+            'readers_app': fingerprint_rows(self.abi_location_mapper.data, reader_key, tuple),
+            'employees': fingerprint_rows(
+                self.person_mapper.data,
+                lambda row: str(row[0]) if row[0] is not None else None,
+                tuple),
+            'efas': fingerprint_rows(
+                self.authorization_mapper.data,
+                room_key,
+                lambda row: (*row[:3],
+                             tuple(sorted(name_tokens(row[4]))),
+                             tuple(sorted(name_tokens(row[5]))))),
+        }
+
+    @instrumented('detect_changes')
+    def detect(self) -> dict[str, SourceDelta]:
+        """
+        This method compares fingerprints of source rows with the snapshot in the database.
+        """
+        return {source: SourceDelta(source, self.db.get_snapshot(source), fingerprints)
+                for source, fingerprints in self.fingerprints().items()}
+
+    def affected(self, deltas: dict[str, SourceDelta]) -> tuple[set[str], set[str]]:
+        """
+        This method returns canonical numbers of affected readers and blueprints of affected rooms.
+        """
+        reader_keys = deltas['readers'].keys | deltas['readers_app'].keys
+        blueprints = set(deltas['efas'].keys)
+
+        # rooms readers were in before they changed
+        for row_key in deltas['readers'].removed | deltas['readers'].changed:
+            reader = self.db.select_reader(row_key)
+            if reader is not None and reader[1] is not None:
+                blueprints.add(reader[1])
+
+        # readers changed employees were authorized for and rooms their new names match
+        changed_people = deltas['employees'].keys
+        for person_number in changed_people:
+            reader_keys.update(ReaderRegistry.key(reader_number)
+                               for reader_number in self.db.select_person_readers(person_number))
+        changed_index = NameIndex(person for person in self.people
+                                  if str(person.person_number) in changed_people)
+        if len(changed_index):
+            for row in self.authorization_mapper.data:
+                if changed_index.find(row[4]) or changed_index.find(row[5]):
+                    blueprints.add(room_key(row))
+
+        for row in self.reader_mapper.data:
+            if reader_key(row) in reader_keys:
+                blueprints.add(normalizer.normalize(row[1]))
+        for row in self.reader_mapper.data:
+            if normalizer.normalize(row[1]) in blueprints:
+                reader_keys.add(reader_key(row))
+
+        blueprints.discard(None)
+        return reader_keys, blueprints
+
+    def restrict(self, reader_keys: set[str], blueprints: set[str]) -> None:
+        """
+        This method leaves only rows of affected readers and rooms in the mappers.
+        """
+        self.reader_mapper.data = [row for row in self.reader_mapper.data
+                                   if reader_key(row) in reader_keys]
+        for mapper in (self.abi_location_mapper, self.velin_mapper):
+            mapper.data = [row for row in mapper.data if reader_key(row) in reader_keys]
+        self.authorization_mapper.data = [row for row in self.authorization_mapper.data
+                                          if room_key(row) in blueprints]
+        for mapper in (self.reader_mapper,
+                       self.abi_location_mapper,
+                       self.velin_mapper,
+                       self.authorization_mapper):
+            mapper.row_count = len(mapper.data)
+
+    def map(self) -> list:
+        """
+        This method maps rows left in the mappers and returns the mapped readers.
+        People must be mapped already.
+        """
+        for reader in self.reader_mapper.get_readers():
+            self.registry.add(reader)
+        self.abi_location_mapper.get_readers()
+        self.velin_mapper.get_readers()
+        return self.authorization_mapper.get_authorizations()
+
+    def run(self) -> dict[str, int]:
+        """
+        This method detects changes, maps affected readers and rooms and applies the changes
+        to the database. Returns numbers of updated rows.
+        """
+        full = not self.db.has_snapshot()
+        deltas = self.detect()
+        for delta in deltas.values():
+            print(delta)
+
+        if not full and not any(deltas.values()):
+            print('Source documents did not change.\n')
+            return {'readers': 0, 'people': 0, 'added': 0, 'removed': 0,
+                    'deleted_readers': 0, 'deleted_people': 0}
+
+        self.people.extend(self.person_mapper.get_people())
+        if full:
+            print('No snapshot found, mapping all rows...')
+            reader_keys = None
+        else:
+            reader_keys, blueprints = self.affected(deltas)
+            self.restrict(reader_keys, blueprints)
+            print(f'Mapping {len(reader_keys)} affected readers in {len(blueprints)} rooms...')
+
+        readers = self.map()
+        authorizations = [(person, reader)
+                          for reader in readers
+                          for person in reader.authorized_personel]
+        # authorizations of unaffected readers are kept, removed readers lose theirs
+        reader_numbers = None
+        if reader_keys is not None:
+            reader_numbers = reader_keys | {reader.reader_number for reader in readers}
+        # readers whose rows were removed from both reader documents
+        stale_readers = ((deltas['readers'].removed | deltas['readers_app'].removed)
+                         - {ReaderRegistry.key(reader.reader_number) for reader in readers})
+
+        with recorder.stage('apply changes') as stage, self.db.transaction():
+            updated_readers = self.db.upsert_readers(readers)
+            updated_people = self.db.upsert_people(
+                dict.fromkeys(person for person, _ in authorizations))
+            added, removed = self.db.sync_authorizations(authorizations,
+                                                         reader_numbers=reader_numbers)
+            deleted_readers = self.db.delete_readers(stale_readers)
+            deleted_people = self.db.delete_people(deltas['employees'].removed)
+            # like a full build, keep only people authorized for some reader
+            deleted_people += self.db.delete_unauthorized_people()
+            for delta in deltas.values():
+                self.db.update_snapshot(delta.source, delta.updates(), delta.removed)
+            stage.rows = len(authorizations)
+
+        print(f'Updated {updated_readers} readers and {updated_people} people, '
+              f'added {added} and removed {removed} authorizations, '
+              f'deleted {deleted_readers} readers and {deleted_people} people.\n')
+        return {'readers': updated_readers, 'people': updated_people, 'added': added, 'removed': removed,
+                'deleted_readers': deleted_readers, 'deleted_people': deleted_people}
@@ -1,151 +1,335 @@
 """
 export_data.py
 This module defines the ExportData class, which is responsible for exporting data from the database
-to Excel files.
+to Excel files, or to CSV and JSON Lines files for systems that do not need Excel.
 """
-import openpyxl as opx
+import argparse
+import logging
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+from functools import lru_cache
 from unidecode import unidecode
 
 from database import Database
+from progress import Progress
+from instrumentation import add_arguments, instrumented, recorder
+from export_writers import WRITERS, ExportWriter, get_writer
+
+
+@lru_cache(maxsize=None)
+def normalize_last_name(last_name: str | None) -> str:
+    """remove czech special characters and spaces from last name, results are cached per name"""
+    return unidecode(last_name or '').replace(' ', '').lower()
+
+
+def run_export(db_name: str, report: str, output_format: str) -> float:
+    """
+    run one report on its own read-only database connection and return elapsed seconds,
+    it is a module level function, so it can run in a worker process
+    """
+    start = time.perf_counter()
+    db = Database(db_name, read_only=True)
+    try:
+        getattr(ExportData(db), f'export_{report}')(output_format)
+    finally:
+        db.close()
+    return time.perf_counter() - start
+
+
+class ReportSink(ABC):
+    """
+    This class is a base class for reports produced by ExportData.export_all.
+    Every row of the joined export data is passed to consume, finish is called after the last row.
+    Rows hold person columns followed by reader columns, either part can be empty,
+    and arrive ordered by reader number.
+    """
+    name = ''
+    file_name = ''
+    text_columns = ()
+
+    def __init__(self, writer: ExportWriter, db: Database) -> None:
+        self.writer = writer
+        self.db = db
+
+    @abstractmethod
+    def consume(self, row: tuple) -> None:
+        """process one row of the joined export data"""
+
+    def finish(self) -> None:
+        """write anything the report collected while consuming rows"""
+
+
+class AuthorizationsReport(ReportSink):
+    """authorizations with person and reader details, readers without authorizations included"""
+    name = 'authorizations'
+    file_name = 'AuthorizationsOutput'
+
+    def __init__(self, writer: ExportWriter, db: Database) -> None:
+        super().__init__(writer, db)
+        self.missing = 0
+
+    def consume(self, row: tuple) -> None:
+        if row[5] is None:
+            return
+        if row[0] is None:
+            self.missing += 1
+        self.writer.write(row)
+
+    def finish(self) -> None:
+        print(f'Found {self.missing} missing authorizations.')
+
+
+class ReadersReport(ReportSink):
+    """one row per reader, export rows arrive ordered by reader number"""
+    name = 'readers'
+    file_name = 'ReadersOutput'
+    # keep reader numbers with leading zeros as text
+    text_columns = (0,)
+
+    def __init__(self, writer: ExportWriter, db: Database) -> None:
+        super().__init__(writer, db)
+        self.last_reader = None
+
+    def consume(self, row: tuple) -> None:
+        if row[5] is None or row[5] == self.last_reader:
+            return
+        self.last_reader = row[5]
+        self.writer.write(row[5:])
+
+
+class DepartmentsReport(ReportSink):
+    """
+    one row per person with the readers the person is authorized for,
+    rows ordered by reader cannot be grouped by person without holding all of them,
+    so people are streamed already grouped from the authorizations primary key in finish
+    """
+    name = 'departments'
+    file_name = 'DepartmentsOutput'
+
+    def consume(self, row: tuple) -> None:
+        pass
+
+    def finish(self) -> None:
+        for person_number, last_name, dept_readers in self.db.iter_person_readers():
+            dept_authorized = normalize_last_name(last_name) + person_number
+            self.writer.write(['', last_name, dept_authorized, dept_readers])
 
 
 class ExportData:
-    """This class is responsible for exporting data from the database to Excel files."""
+    """
+    This class is responsible for exporting data from the database to Excel files.
+    Rows are fed straight from database cursors into a writer selected by output format
+    (xlsx, csv or jsonl), so memory use does not grow with the number of exported rows.
+    Files are written to a temporary file first and atomically renamed into place.
+    """
+    OUTPUT_DIRECTORY = 'output_documents'
+    AUTHORIZATION_COLUMNS = [
+        'Person Number',
+        'First Name',
+        'Last Name',
+        'Card Number',
+        'Email',
+        'Reader Number',
+        'Location Blueprint',
+        'Location Hospital',
+        'Location Name',
+        'ABI Location'
+        ]
+    READER_COLUMNS = [
+        'Reader Number',
+        'Location Blueprint',
+        'Location Hospital',
+        'Location Name',
+        'ABI Location'
+        ]
+    DEPARTMENT_COLUMNS = ['dept_id', 'dept_name', 'dept_authorized', 'dept_readers']
+    REPORTS = {
+        AuthorizationsReport.name: (AuthorizationsReport, AUTHORIZATION_COLUMNS),
+        ReadersReport.name: (ReadersReport, READER_COLUMNS),
+        DepartmentsReport.name: (DepartmentsReport, DEPARTMENT_COLUMNS),
+        }
+
     def __init__(self, db) -> None:
         if not isinstance(db, Database):
             self.db = Database(db)
         else:
             self.db = db
 
+    def check_reports(self, reports: list[str] | None) -> list[str]:
+        """return names of the reports, all of them when None, raise ValueError for unknown names"""
+        reports = list(self.REPORTS) if reports is None else list(reports)
+        unknown = [name for name in reports if name not in self.REPORTS]
+        if unknown:
+            raise ValueError(f'Unknown reports: {", ".join(unknown)}')
+        return reports
 
-    def export_authorizations(self):
-        """export authorizations to excel file"""
-        export = opx.Workbook()
-        sheet = export.active
+    def open_writer(self,
+                    name: str,
+                    columns: list[str],
+                    output_format: str,
+                    text_columns: tuple[int, ...] = ()) -> ExportWriter:
+        """open writer for output_documents/<name>.<format>"""
+        writer = get_writer(output_format)
+        return writer(f'{self.OUTPUT_DIRECTORY}/{name}.{writer.extension}', columns, text_columns)
 
+    @instrumented('export_authorizations', rows=lambda self, written: written)
+    def export_authorizations(self, output_format: str = 'xlsx') -> int:
+        """export authorizations to file in the given output format, returns number of written rows"""
         print('Exporting authorizations...')
-        sheet.append([
-            'Person Number',
-            'First Name',
-            'Last Name',
-            'Card Number',
-            'Email',
-            'Reader Number',
-            'Location Blueprint',
-            'Location Hospital',
-            'Location Name',
-            'ABI Location'
-            ])
-
-        authorizations = self.db.get_authorizations()
-        readers = self.db.get_readers()
-        readers_with_authorizations = set([authorizations[1] for authorizations in authorizations])
-        print('Readers_with_authorizations:', len(readers_with_authorizations))
-        progress = 0
-        complete = len(authorizations)
-        for authorization in authorizations:
-            progress += 1
-            print(
-                f"Progress: {'█'*(progress//(complete // 10))}{' '*(10-progress//(complete // 10))} {progress}/{complete}", end="\r") # pylint: disable=C0301
-            reader = self.db.select_reader(authorization[1])
-            person = self.db.select_person(authorization[0])
-
-            row = [
-                person[0],  # Person Number
-                person[1],  # First Name
-                person[2],  # Last Name
-                person[3],  # Card Number
-                person[4],  # Email
-                reader[0],  # Reader Number
-                reader[1],  # Location Blueprint
-                reader[2],  # Location Hospital
-                reader[3],  # Location Name
-                reader[4]   # ABI Location
-            ]
-            sheet.append(row)
-
-        print('Checking for missing authorizations...')
-        progress = 0
-        complete = len(readers)
-        count = 0
-        for reader in readers:
-            progress += 1
-            print(
-                f"Progress: {'█'*(progress//(complete // 10))}{' '*(10-progress//(complete // 10))} {progress}/{complete}", end="\r") # pylint: disable=C0301
-            if reader[0] not in readers_with_authorizations:
-                row = [None] * 5 + list(reader)
-                sheet.append(row)
-                count += 1
+        with self.open_writer('AuthorizationsOutput',
+                              self.AUTHORIZATION_COLUMNS,
+                              output_format) as writer, \
+                Progress('authorizations', self.db.count_authorization_report()) as progress:
+            count = 0
+            for row in progress.iter(self.db.iter_authorization_report()):
+                # readers without authorizations have empty person columns
+                if row[0] is None:
+                    count += 1
+                writer.write(row)
 
         print(f'Found {count} missing authorizations.')
-        export.save('output_documents/AuthorizationsOutput.xlsx')
         print('Export complete.')
-        print('Output saved to output_documents/AuthorizationsOutput.xlsx')
+        print(f'Output saved to {writer.path}')
+        return writer.rows
 
-    def export_readers(self):
-        """export readers to excel file"""
-        export = opx.Workbook()
-        sheet = export.active
-
-        for cell in sheet['A']:
-            cell.number_format = 'Text'
-        print('Setting cell format to text...')
+    @instrumented('export_readers', rows=lambda self, written: written)
+    def export_readers(self, output_format: str = 'xlsx') -> int:
+        """export readers to file in the given output format, returns number of written rows"""
         print('Exporting readers...')
-        sheet.append([
-            'Reader Number',
-            'Location Blueprint',
-            'Location Hospital',
-            'Location Name',
-            'ABI Location'
-            ])
-
-        readers = self.db.get_readers()
-        progress = 0
-        complete = len(readers)
-        for reader in readers:
-            progress += 1
-            print(
-                f"Progress: {'█'*(progress//(complete // 10))}{' '*(10-progress//(complete // 10))} {progress}/{complete}", end="\r") # pylint: disable=C0301
-            sheet.append(reader)
-
-        export.save('output_documents/ReadersOutput.xlsx')
-        print('Export complete.')
-        print('Output saved to output_documents/ReadersOutput.xlsx')
+        # keep reader numbers with leading zeros as text
+        with self.open_writer('ReadersOutput',
+                              self.READER_COLUMNS,
+                              output_format,
+                              text_columns=(0,)) as writer, \
+                Progress('readers', self.db.count_readers()) as progress:
+            for reader in progress.iter(self.db.iter_readers()):
+                writer.write(reader)
 
-    def export_departments(self):
-        """export departments to excel file"""
-        export = opx.Workbook()
-        sheet = export.active
+        print('Export complete.')
+        print(f'Output saved to {writer.path}')
+        return writer.rows
 
+    @instrumented('export_departments', rows=lambda self, written: written)
+    def export_departments(self, output_format: str = 'xlsx') -> int:
+        """export departments to file in the given output format, returns number of written rows"""
         print('Exporting departments...')
-        sheet.append(['dept_id', 'dept_name', 'dept_authorized', 'dept_readers'])
+        with self.open_writer('DepartmentsOutput',
+                              self.DEPARTMENT_COLUMNS,
+                              output_format) as writer, \
+                Progress('departments', self.db.count_people()) as progress:
+            for person_number, last_name, dept_readers in progress.iter(
+                    self.db.iter_person_readers()):
+                dept_authorized = normalize_last_name(last_name) + person_number
+                writer.write(['', last_name, dept_authorized, dept_readers])
 
-        authorizations = self.db.get_authorizations()
-        people = self.db.get_people()
+        return writer.rows
 
-        progress = 0
-        complete = len(people)
-        for person in people:
-            progress += 1
-            dept_readers = ''
-            # remove czech special characters
-            normalized_last_name = unidecode(person[2]).replace(' ', '').lower()
+    @instrumented('export_all', rows=lambda self, written: sum(written.values()))
+    def export_all(self,
+                   reports: list[str] | None = None,
+                   output_format: str = 'xlsx',
+                   output_formats: dict[str, str] | None = None) -> dict[str, int]:
+        """
+        export several reports from a single pass over the joined data,
+        departments are streamed from their own query grouped by person,
+        output_formats overrides output_format per report,
+        returns number of written rows per report
+        """
+        reports = self.check_reports(reports)
+        output_formats = output_formats or {}
 
-            dept_authorized = normalized_last_name + person[0]
-            for authorization in authorizations:
-                if authorization[0] == person[0]:
-                    reader = self.db.select_reader(authorization[1])
-                    dept_readers += reader[0] + ' '
+        print(f'Exporting {", ".join(reports)}...')
+        with ExitStack() as stack:
+            sinks = []
+            for name in reports:
+                sink, columns = self.REPORTS[name]
+                writer = stack.enter_context(self.open_writer(sink.file_name,
+                                                              columns,
+                                                              output_formats.get(name) or output_format,
+                                                              sink.text_columns))
+                sinks.append(sink(writer, self.db))
 
-            print(
-                f"Progress: {'█'*(progress//(complete // 10))}{' '*(10-progress//(complete // 10))} {progress}/{complete}", end="\r") # pylint: disable=C0301
-            sheet.append(['', person[2], dept_authorized, dept_readers])
+            # counting the joined rows would take another pass, the total is left unknown
+            with Progress(', '.join(reports)) as progress:
+                for row in progress.iter(self.db.iter_export_rows()):
+                    for sink in sinks:
+                        sink.consume(row)
+
+            for sink in sinks:
+                sink.finish()
+
+        print('Export complete.')
+        for sink in sinks:
+            print(f'Output saved to {sink.writer.path}')
+        return {sink.name: sink.writer.rows for sink in sinks}
+
+    @instrumented('export_parallel')
+    def export_parallel(self,
+                        reports: list[str] | None = None,
+                        output_format: str = 'xlsx',
+                        output_formats: dict[str, str] | None = None,
+                        max_workers: int | None = None) -> dict[str, float]:
+        """
+        export reports in parallel worker processes, each with its own read-only connection
+        to the database file, returns elapsed seconds per report,
+        raises RuntimeError when any of the reports fails
+        """
+        reports = self.check_reports(reports)
+        output_formats = output_formats or {}
+        timings = {}
+        failures = {}
+
+        print(f'Exporting {", ".join(reports)} in parallel...')
+        with ProcessPoolExecutor(max_workers=max_workers or len(reports)) as executor:
+            futures = {executor.submit(run_export,
+                                       self.db.db_name,
+                                       name,
+                                       output_formats.get(name) or output_format): name
+                       for name in reports}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    timings[name] = future.result()
+                except Exception as error: # pylint: disable=W0718
+                    failures[name] = error
+                    executor.shutdown(wait=False, cancel_futures=True)
+
+        for name, elapsed in timings.items():
+            print(f'{name}: {elapsed:.2f} s')
+        if failures:
+            message = ', '.join(f'{name} ({error})' for name, error in failures.items())
+            raise RuntimeError(f'Export failed: {message}') from next(iter(failures.values()))
+
+        print('Export complete.')
+        return timings
 
-        export.save('output_documents/DepartmentsOutput.xlsx')
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export data from the readers database.')
+    parser.add_argument('--format', default='xlsx', choices=WRITERS,
+                        help='output format of all exports')
+    for report in ('authorizations', 'readers', 'departments'):
+        parser.add_argument(f'--{report}-format', choices=WRITERS,
+                            help=f'output format of the {report} export, overrides --format')
+    parser.add_argument('--parallel',
+                        action='store_true',
+                        help='run every report in its own process instead of one shared pass')
+    add_arguments(parser)
+    args = parser.parse_args()
+    recorder.configure(trace_memory=args.trace_memory, profile_dir=args.profile)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
+
     db = Database('database.db')
     export_workbook = ExportData(db)
-    export_workbook.export_authorizations()
-    export_workbook.export_readers() 
-    export_workbook.export_departments()
+    formats = {
+        'authorizations': args.authorizations_format,
+        'readers': args.readers_format,
+        'departments': args.departments_format,
+        }
+    if args.parallel:
+        export_workbook.export_parallel(output_format=args.format, output_formats=formats)
+    else:
+        export_workbook.export_all(output_format=args.format, output_formats=formats)
+    print(f'Run report saved to {recorder.write_report(args.report)}')
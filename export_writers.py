@@ -0,0 +1,152 @@
+"""
+export_writers.py
+This module defines the writers ExportData uses to store exported rows.
+Every writer streams rows into a temporary file next to the target file
+and atomically renames it into place when it is closed.
+"""
+import csv
+import json
+import os
+import tempfile
+from abc import ABC, abstractmethod
+import openpyxl as opx
+from openpyxl.cell import WriteOnlyCell
+
+
+class ExportWriter(ABC):
+    """
+    This class is a base class for export writers.
+    It manages the temporary file, subclasses implement opening, writing and finishing the output.
+    It is used as a context manager, output is discarded when the block raises an exception.
+    """
+    extension = ''
+
+    def __init__(self, path: str, header: list[str], text_columns: tuple[int, ...] = ()) -> None:
+        self.path = path
+        self.header = list(header)
+        self.text_columns = set(text_columns)
+        self.rows = 0
+        self.discarding = False
+
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        handle, self.temp_path = tempfile.mkstemp(suffix='.tmp', dir=directory)
+        os.close(handle)
+        self.open()
+
+    @abstractmethod
+    def open(self) -> None:
+        """open the output and write the header"""
+
+    @abstractmethod
+    def write(self, row) -> None:
+        """write one row to the output"""
+
+    @abstractmethod
+    def finish(self) -> None:
+        """flush and close the output, discarding is set when the output will be removed"""
+
+    def close(self) -> None:
+        """finish the output and move it to its final path"""
+        self.finish()
+        os.replace(self.temp_path, self.path)
+
+    def discard(self) -> None:
+        """finish the output and remove the temporary file"""
+        self.discarding = True
+        try:
+            self.finish()
+        finally:
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+
+    def __enter__(self) -> 'ExportWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class ExcelWriter(ExportWriter):
+    """
+    This class writes rows into a write-only Excel workbook.
+    Columns listed in text_columns get the text number format.
+    """
+    extension = 'xlsx'
+
+    def open(self) -> None:
+        self.workbook = opx.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append(self.header)
+
+    def write(self, row) -> None:
+        if self.text_columns:
+            row = list(row)
+            for column in self.text_columns:
+                cell = WriteOnlyCell(self.sheet, value=row[column])
+                cell.number_format = '@'
+                row[column] = cell
+        self.sheet.append(row)
+        self.rows += 1
+
+    def finish(self) -> None:
+        if self.workbook is not None:
+            if self.discarding:
+                # a discarded workbook is not saved, only the temporary sheet file is dropped
+                self.sheet.close()
+                self.sheet._writer.cleanup() # pylint: disable=W0212
+            else:
+                self.workbook.save(self.temp_path)
+            self.workbook = None
+
+
+class CsvWriter(ExportWriter):
+    """
+    This class writes rows into an UTF-8 encoded CSV file.
+    """
+    extension = 'csv'
+
+    def open(self) -> None:
+        self.file = open(self.temp_path, 'w', newline='', encoding='utf-8') # pylint: disable=R1732
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.header)
+
+    def write(self, row) -> None:
+        self.writer.writerow(row)
+        self.rows += 1
+
+    def finish(self) -> None:
+        self.file.close()
+
+
+class JsonLinesWriter(ExportWriter):
+    """
+    This class writes rows as JSON objects keyed by the header, one object per line.
+    """
+    extension = 'jsonl'
+
+    def open(self) -> None:
+        self.file = open(self.temp_path, 'w', encoding='utf-8') # pylint: disable=R1732
+
+    def write(self, row) -> None:
+        self.file.write(json.dumps(dict(zip(self.header, row)), ensure_ascii=False))
+        self.file.write('\n')
+        self.rows += 1
+
+    def finish(self) -> None:
+        self.file.close()
+
+
+WRITERS = {writer.extension: writer for writer in (ExcelWriter, CsvWriter, JsonLinesWriter)}
+
+
+def get_writer(output_format: str) -> type[ExportWriter]:
+    """return writer class for the output format, e.g. xlsx, csv or jsonl"""
+    try:
+        return WRITERS[output_format]
+    except KeyError:
+        raise ValueError(f'Unknown output format: {output_format}, '
+                         f'choose one of {", ".join(WRITERS)}') from None
@@ -0,0 +1,247 @@
+"""
+instrumentation.py
+This module defines the Instrumentation class, which measures stages of a run.
+Every stage records wall time, CPU time, growth of the peak RSS, tracemalloc peak and the number of processed rows.
+Measurements are written to a JSON run report, stages can optionally be profiled with cProfile.
+"""
+import cProfile
+import functools
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator
+
+try:
+    import resource
+except ImportError: # resource module is not available on Windows
+    resource = None
+
+
+def peak_rss_kb() -> int | None:
+    """
+    This function returns the peak resident set size of the process in kilobytes,
+    None when the platform does not report it.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class Stage:
+    """
+    This class holds measurements of one stage.
+    Code running inside the stage can set rows to the number of processed rows.
+    The operating system only reports the peak RSS of the whole process, so peak_rss_growth_kb
+    is how much the stage raised it, 0 when the stage stayed below a peak reached earlier.
+    """
+    def __init__(self, name: str, parent: 'Stage | None' = None) -> None:
+        self.name = name
+        self.parent = parent
+        self.depth = 0 if parent is None else parent.depth + 1
+        self.rows = None
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.peak_rss_growth_kb = None
+        self.tracemalloc_peak_kb = None
+        self.profile_path = None
+        self.error = None
+        # highest tracemalloc peak of nested stages, they reset the peak when they start
+        self.nested_peak = 0
+
+    def as_dict(self) -> dict:
+        """
+        This method returns the measurements as a JSON serializable dictionary.
+        """
+        return {
+            'name': self.name,
+            'parent': self.parent.name if self.parent is not None else None,
+            'depth': self.depth,
+            'rows': self.rows,
+            'wall_time_s': round(self.wall_time, 6),
+            'cpu_time_s': round(self.cpu_time, 6),
+            'peak_rss_growth_kb': self.peak_rss_growth_kb,
+            'tracemalloc_peak_kb': self.tracemalloc_peak_kb,
+            'profile': self.profile_path,
+            'error': self.error,
+        }
+
+
+class Instrumentation:
+    """
+    This class records stages of a run and writes them to a JSON report.
+    Wall and CPU time and growth of the peak RSS are always recorded, the report also holds
+    the peak RSS of the whole process. With trace_memory the tracemalloc peak of every stage
+    is recorded too, which slows the run down noticeably.
+    With profile_dir every stage that is not nested in another profiled stage is run under cProfile
+    and its statistics are dumped to <profile_dir>/<index>_<stage>.prof.
+    """
+    def __init__(self) -> None:
+        self.stages = []
+        self.stack = []
+        self.trace_memory = False
+        self.profile_dir = None
+        self.profiling = False
+        self.started = datetime.now()
+        self.started_time = time.perf_counter()
+        self.started_cpu = time.process_time()
+
+    def configure(self, trace_memory: bool = False, profile_dir: str | None = None) -> None:
+        """
+        This method enables tracemalloc and cProfile measurements and starts a new run.
+        """
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        This method drops recorded stages and restarts the run clock.
+        """
+        self.stages = []
+        self.stack = []
+        self.started = datetime.now()
+        self.started_time = time.perf_counter()
+        self.started_cpu = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str, rows: int | None = None) -> Iterator[Stage]:
+        """
+        This method measures the code running inside the with block as a stage.
+        """
+        parent = self.stack[-1] if self.stack else None
+        stage = Stage(name, parent)
+        stage.rows = rows
+        self.stages.append(stage)
+        self.stack.append(stage)
+
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            if parent is not None:
+                parent.nested_peak = max(parent.nested_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+        profile = None
+        if self.profile_dir and not self.profiling:
+            profile = cProfile.Profile()
+            self.profiling = True
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        rss_start = peak_rss_kb()
+        try:
+            if profile is not None:
+                profile.enable()
+            yield stage
+        except BaseException as error:
+            stage.error = f'{type(error).__name__}: {error}'
+            raise
+        finally:
+            if profile is not None:
+                profile.disable()
+            stage.wall_time = time.perf_counter() - wall_start
+            stage.cpu_time = time.process_time() - cpu_start
+            if rss_start is not None:
+                stage.peak_rss_growth_kb = peak_rss_kb() - rss_start
+
+            if tracing:
+                peak = max(tracemalloc.get_traced_memory()[1], stage.nested_peak)
+                stage.tracemalloc_peak_kb = peak // 1024
+                if parent is not None:
+                    parent.nested_peak = max(parent.nested_peak, peak)
+
+            if profile is not None:
+                self.profiling = False
+                stage.profile_path = self.profile_path(stage)
+                profile.dump_stats(stage.profile_path)
+
+            self.stack.pop()
+
+    def profile_path(self, stage: Stage) -> str:
+        """
+        This method returns the path of the cProfile dump of the stage.
+        """
+        index = self.stages.index(stage)
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', stage.name).strip('_')
+        return os.path.join(self.profile_dir, f'{index:03d}_{slug}.prof')
+
+    def report(self) -> dict:
+        """
+        This method returns the run report as a JSON serializable dictionary.
+        """
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'argv': sys.argv,
+            'python': sys.version.split()[0],
+            'platform': sys.platform,
+            'wall_time_s': round(time.perf_counter() - self.started_time, 6),
+            'cpu_time_s': round(time.process_time() - self.started_cpu, 6),
+            'peak_rss_kb': peak_rss_kb(),
+            'trace_memory': self.trace_memory,
+            'stages': [stage.as_dict() for stage in self.stages],
+        }
+
+    def write_report(self, path: str | None = None) -> str:
+        """
+        This method writes the run report to a JSON file and returns its path.
+        Without a path the report is written to run_reports/run_<start time>.json,
+        so reports of consecutive runs can be compared.
+        """
+        if path is None:
+            path = os.path.join('run_reports', f'run_{self.started:%Y%m%d_%H%M%S}.json')
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.report(), file, indent=2)
+        return path
+
+
+recorder = Instrumentation()
+
+
+def instrumented(name: str, rows: Callable | None = None) -> Callable:
+    """
+    This function returns a decorator measuring a method as a stage of the recorder.
+    The name is formatted with the instance, e.g. 'read_data {self.file_path}',
+    rows is called with the instance and the return value to count processed rows.
+    """
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(self, *args, **kwargs):
+            with recorder.stage(name.format(self=self)) as stage:
+                result = function(self, *args, **kwargs)
+                if rows is not None:
+                    stage.rows = rows(self, result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def add_arguments(parser) -> None:
+    """
+    This function adds run report and profiling options to an argparse parser.
+    """
+    parser.add_argument('--report',
+                        default=None,
+                        help='path of the JSON run report, '
+                             'defaults to run_reports/run_<start time>.json')
+    parser.add_argument('--profile',
+                        metavar='DIRECTORY',
+                        default=None,
+                        help='dump cProfile statistics of every stage into the directory')
+    parser.add_argument('--trace-memory',
+                        action='store_true',
+                        help='record tracemalloc peaks of every stage, slows the run down')
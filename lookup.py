@@ -0,0 +1,220 @@
+"""
+lookup.py
+This module defines the AccessIndex class, which answers who can open a reader
+and which readers a person can open, from indexes loaded from the database into memory.
+It can be run as a command line tool answering single queries or batches of queries from a file.
+"""
+import argparse
+import json
+import sys
+import time
+from array import array
+from typing import Iterable, Iterator
+from database import Database
+from reader import ReaderRegistry
+from formater import normalizer
+
+
+class AccessIndex:
+    """
+    This class holds people, readers and authorizations loaded from the database.
+    People and readers get interned integer IDs, authorizations are stored as adjacency arrays
+    of those IDs in both directions. People are indexed by person number, card number and email,
+    readers by their canonical reader number and location blueprint, so every query
+    is a few dictionary lookups.
+    """
+    QUERIES = ('reader', 'person', 'card', 'email', 'blueprint')
+
+    def __init__(self, db: Database) -> None:
+        # person and reader rows by their IDs
+        self.people = []
+        self.readers = []
+        self.person_ids = {}
+        self.reader_ids = {}
+        self.person_readers = []
+        self.reader_people = []
+        self.by_card = {}
+        self.by_email = {}
+        self.by_blueprint = {}
+        self.load(db)
+
+    def load(self, db: Database) -> None:
+        """
+        This method loads people, readers and authorizations from the database.
+        """
+        for row in db.iter_rows('''SELECT person_number, first_name, last_name, card_number, email
+                                FROM people'''):
+            self.add_person(row)
+
+        for row in db.iter_readers():
+            self.add_reader(row)
+
+        for person_number, reader_number in db.iter_rows('''SELECT person_number, reader_number
+                                                         FROM authorizations'''):
+            person_id = self.person_ids.get(person_number)
+            if person_id is None:
+                person_id = self.add_person((person_number, None, None, None, None))
+            reader_id = self.reader_ids.get(ReaderRegistry.key(reader_number))
+            if reader_id is None:
+                reader_id = self.add_reader((reader_number, None, None, None, None))
+            self.person_readers[person_id].append(reader_id)
+            self.reader_people[reader_id].append(person_id)
+
+    def add_person(self, row: tuple) -> int:
+        """
+        This method interns a person row and indexes it, returns the ID of the person.
+        """
+        person_id = len(self.people)
+        self.people.append(row)
+        self.person_ids[row[0]] = person_id
+        self.person_readers.append(array('I'))
+        if row[3] is not None:
+            self.by_card.setdefault(str(row[3]).strip(), []).append(person_id)
+        if row[4] is not None:
+            self.by_email.setdefault(str(row[4]).strip().casefold(), []).append(person_id)
+        return person_id
+
+    def add_reader(self, row: tuple) -> int:
+        """
+        This method interns a reader row and indexes it, returns the ID of the reader.
+        """
+        reader_id = len(self.readers)
+        self.readers.append(row)
+        self.reader_ids[ReaderRegistry.key(row[0])] = reader_id
+        self.reader_people.append(array('I'))
+        if row[1] is not None:
+            self.by_blueprint.setdefault(normalizer.normalize(row[1]), []).append(reader_id)
+        return reader_id
+
+    def person(self, person_id: int) -> dict:
+        """
+        This method returns a person with numbers of readers the person can open.
+        """
+        person_number, first_name, last_name, card_number, email = self.people[person_id]
+        return {
+            'person_number': person_number,
+            'first_name': first_name,
+            'last_name': last_name,
+            'card_number': card_number,
+            'email': email,
+            'readers': [self.readers[reader_id][0] for reader_id in self.person_readers[person_id]],
+        }
+
+    def reader(self, reader_id: int) -> dict:
+        """
+        This method returns a reader with numbers of people who can open it.
+        """
+        reader_number, location_blueprint, location_hospital, location_name, abi_location = \
+            self.readers[reader_id]
+        return {
+            'reader_number': reader_number,
+            'location_blueprint': location_blueprint,
+            'location_hospital': location_hospital,
+            'location_name': location_name,
+            'abi_location': abi_location,
+            'people': [self.people[person_id][0] for person_id in self.reader_people[reader_id]],
+        }
+
+    def query(self, kind: str, value: str) -> list[dict]:
+        """
+        This method answers a query, e.g. ('reader', '01234') or ('card', '1000123').
+        Reader queries return readers with people who can open them, other queries return
+        people with readers they can open, blueprint queries return all readers in the room.
+        """
+        value = value.strip()
+        if kind == 'reader':
+            reader_id = self.reader_ids.get(ReaderRegistry.key(value))
+            return [self.reader(reader_id)] if reader_id is not None else []
+        if kind == 'blueprint':
+            return [self.reader(reader_id)
+                    for reader_id in self.by_blueprint.get(normalizer.normalize(value), [])]
+        if kind == 'person':
+            person_id = self.person_ids.get(value)
+            return [self.person(person_id)] if person_id is not None else []
+        if kind == 'card':
+            return [self.person(person_id) for person_id in self.by_card.get(value, [])]
+        if kind == 'email':
+            return [self.person(person_id) for person_id in self.by_email.get(value.casefold(), [])]
+
+        raise ValueError(f'Unknown query: {kind}, choose one of {", ".join(self.QUERIES)}')
+
+
+def read_queries(lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """
+    This function yields (kind, value) queries from lines like 'reader 01234',
+    empty lines and lines starting with # are skipped.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        kind, _, value = line.partition(' ')
+        yield kind, value
+
+
+def format_result(result: dict) -> str:
+    """
+    This function formats a reader or a person found by a query as text.
+    """
+    if 'people' in result:
+        return (f'reader {result["reader_number"]} - {result["location_name"]} '
+                f'({result["location_blueprint"]}): {len(result["people"])} people\n  '
+                + ' '.join(result['people']))
+    return (f'person {result["person_number"]} - {result["first_name"]} {result["last_name"]}, '
+            f'card {result["card_number"]}: {len(result["readers"])} readers\n  '
+            + ' '.join(result['readers']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Look up who can open a reader '
+                                                 'and which readers a person can open.')
+    parser.add_argument('kind', nargs='?', choices=AccessIndex.QUERIES, help='type of the query')
+    parser.add_argument('value', nargs='?', help='reader number, person number, card number, '
+                                                 'email or location blueprint')
+    parser.add_argument('--batch',
+                        metavar='FILE',
+                        default=None,
+                        help="file with one query per line, e.g. 'reader 01234', - reads standard input")
+    parser.add_argument('--database', default='database.db', help='path of the database')
+    parser.add_argument('--json', action='store_true', help='print results as JSON lines')
+    parser.add_argument('--timing', action='store_true', help='print time of every query')
+    args = parser.parse_args()
+    if args.batch is None and (args.kind is None or args.value is None):
+        parser.error('give a query or --batch FILE')
+
+    start = time.perf_counter()
+    db = Database(args.database, read_only=True)
+    try:
+        index = AccessIndex(db)
+    finally:
+        db.close()
+    if args.timing:
+        print(f'Loaded {len(index.people)} people and {len(index.readers)} readers '
+              f'in {time.perf_counter() - start:.3f} s', file=sys.stderr)
+
+    if args.batch is None:
+        queries = [(args.kind, args.value)]
+    elif args.batch == '-':
+        queries = read_queries(sys.stdin)
+    else:
+        with open(args.batch, 'r', encoding='utf-8') as file:
+            queries = list(read_queries(file))
+
+    for query_kind, query_value in queries:
+        start = time.perf_counter()
+        try:
+            results = index.query(query_kind, query_value)
+        except ValueError as error:
+            print(error, file=sys.stderr)
+            continue
+        elapsed = time.perf_counter() - start
+
+        if args.json:
+            print(json.dumps({'query': query_kind, 'value': query_value, 'results': results},
+                             ensure_ascii=False))
+        else:
+            print(f'{query_kind} {query_value}: {len(results)} found')
+            for result in results:
+                print(format_result(result))
+        if args.timing:
+            print(f'{query_kind} {query_value}: {elapsed * 1e6:.0f} µs', file=sys.stderr)
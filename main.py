@@ -1,60 +1,137 @@
+import argparse
+import logging
 from data_readers import ReaderMapper, PersonMapper, AuthorizationMapper, ABILocationMapper, VelinMapper
+from data_readers import ingest_sources, source_cache, workbook_cache
+from reader import ReaderRegistry
 from database import Database
 from export_data import ExportData
-from sqlite3 import IntegrityError
+from progress import Progress
+from instrumentation import add_arguments, recorder
+from delta import DeltaPipeline
 
 
 if __name__ == '__main__':
-    reader_mapper = ReaderMapper('source_documents/export_readers.xlsx')
-    readers = reader_mapper.get_readers()
+    parser = argparse.ArgumentParser(description='Build the readers database from source documents.')
+    parser.add_argument('--refresh',
+                        action='store_true',
+                        help='update changed people and readers and remove stale authorizations '
+                             'in the existing database instead of only inserting new rows')
+    parser.add_argument('--delta',
+                        action='store_true',
+                        help='map and store only readers and rooms affected by source rows '
+                             'that changed since the last delta run')
+    parser.add_argument('--staging',
+                        action='store_true',
+                        help='build a new database in a staging file and publish it into the database '
+                             'in one transaction when it is complete and checked')
+    parser.add_argument('--workers',
+                        type=int,
+                        default=None,
+                        help='number of processes parsing the source files, 1 parses them in turn')
+    parser.add_argument('--no-cache',
+                        action='store_true',
+                        help='parse all source files even if they did not change since the last run')
+    add_arguments(parser)
+    args = parser.parse_args()
+    if args.staging and (args.refresh or args.delta):
+        parser.error('--staging builds a new database, it cannot be combined with --refresh or --delta')
+    source_cache.enabled = not args.no_cache
+    recorder.configure(trace_memory=args.trace_memory, profile_dir=args.profile)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
 
-    abi_location_mapper = ABILocationMapper(
-        'source_documents/export_readers_app.xlsx', readers=readers)
-    readers = abi_location_mapper.get_readers()
+    # parse all source files in parallel, mappers below take their rows from workbook_cache
+    with recorder.stage('ingest_sources'):
+        ingest_sources([
+            ('source_documents/export_readers.xlsx', ReaderMapper.DEFAULT_COLUMNS),
+            ('source_documents/export_readers_app.xlsx', ABILocationMapper.DEFAULT_COLUMNS),
+            ('source_documents/export_readers_app.xlsx', VelinMapper.DEFAULT_COLUMNS),
+            ('source_documents/export_employees.xlsx', PersonMapper.DEFAULT_COLUMNS),
+            ('source_documents/export_efas.xlsx', AuthorizationMapper.DEFAULT_COLUMNS),
+            ], max_workers=args.workers)
 
-    velin_reader_mapper = VelinMapper('source_documents/export_readers_app.xlsx', readers=readers)
-    readers = velin_reader_mapper.get_readers()
+    if args.delta:
+        db = Database('database.db', pragmas=Database.BUILD_PRAGMAS)
+        with recorder.stage('database build'):
+            DeltaPipeline(db).run()
+        workbook_cache.clear()
+    else:
+        reader_mapper = ReaderMapper('source_documents/export_readers.xlsx')
+        readers = reader_mapper.get_readers()
+        reader_registry = ReaderRegistry(readers)
 
-    person_mapper = PersonMapper('source_documents/export_employees.xlsx')
-    personel = person_mapper.get_people()
+        abi_location_mapper = ABILocationMapper(
+            'source_documents/export_readers_app.xlsx', readers=reader_registry)
+        readers = abi_location_mapper.get_readers()
 
-    authorization_mapper = AuthorizationMapper(
-        'source_documents/export_efas.xlsx', readers=readers, personel=personel)
-    authorized_readers = authorization_mapper.get_authorizations()
+        velin_reader_mapper = VelinMapper('source_documents/export_readers_app.xlsx',
+                                          readers=reader_registry)
+        readers = velin_reader_mapper.get_readers()
 
+        person_mapper = PersonMapper('source_documents/export_employees.xlsx')
+        personel = person_mapper.get_people()
 
-    print(f'Found {len(authorized_readers)} readers...')
+        authorization_mapper = AuthorizationMapper(
+            'source_documents/export_efas.xlsx', readers=readers, personel=personel)
+        authorized_readers = authorization_mapper.get_authorizations()
+        if authorization_mapper.unmatched_names:
+            print(f'Unmatched names saved to {authorization_mapper.export_unmatched()}\n')
+        workbook_cache.clear()
 
-    db = Database('database.db')
+        print(f'Found {len(authorized_readers)} readers...')
 
-    print('Building database...')
-    progress = 0 # pylint: disable=C0103
-    complete = len(readers)
-    for reader in readers:
-        progress += 1
-        print(
-            f"Progress: {'█'*(progress//(complete // 10))}{' '*(10-progress//(complete // 10))} {progress}/{complete}", end="\r") # pylint: disable=C0301
+        if args.staging:
+            db = Database.staging('database.db')
+        else:
+            db = Database('database.db', pragmas=Database.BUILD_PRAGMAS)
+        authorizations = [(person, reader)
+                          for reader in readers
+                          for person in reader.authorized_personel]
 
-        try:
-            db.insert_reader(reader)
-        except IntegrityError:
-            #TODO: Add routine to update reader information
-            # print(f'Reader already exists in database. {reader}')
-            pass
-
-        for person in reader.authorized_personel:
-            try:
-                db.insert_person(person)
-            except IntegrityError:
-                #TODO: Add routine to update person information
-                # print(f'Person already exists in database. {person}')
-                pass
-
-            db.insert_authorization(person, reader)
-
-    print('Database built.\n')
+        with recorder.stage('database build'):
+            if args.refresh:
+                print('Refreshing database...')
+                with recorder.stage('upsert_readers') as stage, \
+                        Progress('Readers', len(readers)) as progress:
+                    updated_readers = db.upsert_readers(readers, on_batch=progress.advance_to)
+                    stage.rows = progress.count
+                with recorder.stage('upsert_people') as stage, Progress('People') as progress:
+                    updated_people = db.upsert_people(
+                        (person for reader in readers for person in reader.authorized_personel),
+                        on_batch=progress.advance_to)
+                    stage.rows = progress.count
+                with recorder.stage('sync_authorizations') as stage, \
+                        Progress('Authorizations', len(authorizations)) as progress:
+                    added, removed = db.sync_authorizations(authorizations,
+                                                            on_batch=progress.advance_to)
+                    stage.rows = progress.count
+                print(f'Updated {updated_readers} readers and {updated_people} people, '
+                      f'added {added} and removed {removed} authorizations.')
+                print('Database refreshed.\n')
+            else:
+                print('Building database...')
+                with recorder.stage('insert_readers') as stage, \
+                        Progress('Readers', len(readers)) as progress:
+                    db.insert_readers(readers, on_batch=progress.advance_to)
+                    stage.rows = progress.count
+                with recorder.stage('insert_people') as stage, Progress('People') as progress:
+                    db.insert_people(
+                        (person for reader in readers for person in reader.authorized_personel),
+                        on_batch=progress.advance_to)
+                    stage.rows = progress.count
+                with recorder.stage('insert_authorizations') as stage, \
+                        Progress('Authorizations', len(authorizations)) as progress:
+                    db.insert_authorizations(authorizations, on_batch=progress.advance_to)
+                    stage.rows = progress.count
+                print('Database built.\n')
+            if args.staging:
+                with recorder.stage('publish'):
+                    db.publish('database.db')
+                print('Database published.\n')
+                db = Database('database.db')
+            else:
+                # the snapshot of source rows no longer describes the database contents
+                db.clear_snapshot()
 
     export = ExportData(db)
-    export.export_authorizations()
-    export.export_readers()
-    
\ No newline at end of file
+    export.export_all(['authorizations', 'readers'])
+    print(f'Run report saved to {recorder.write_report(args.report)}')
@@ -0,0 +1,144 @@
+"""
+progress.py
+This module defines the Progress class, which reports progress of long running loops.
+On a terminal it redraws a progress bar, in batch mode (cron, redirected output)
+it writes structured log lines instead.
+"""
+import logging
+import sys
+import time
+from typing import Iterable, Iterator, TextIO
+
+logger = logging.getLogger('progress')
+
+
+class Progress:
+    """
+    Progress class
+    This class reports progress of a loop over a known or unknown number of items.
+    On a terminal the bar is redrawn at most once per min_interval seconds and only
+    when it advanced by at least min_percent. When the stream is not a terminal,
+    the bar is turned off and a log line is written every log_percent percent
+    (or every log_interval seconds when the total is unknown).
+    """
+    BAR_WIDTH = 10
+
+    def __init__(self,
+                 label: str,
+                 total: int | None = None,
+                 min_interval: float = 0.1,
+                 min_percent: float = 1.0,
+                 log_percent: float = 10.0,
+                 log_interval: float = 30.0,
+                 stream: TextIO | None = None) -> None:
+        self.label = label
+        self.total = total or None
+        self.count = 0
+        self.min_interval = min_interval
+        self.min_percent = min_percent
+        self.log_percent = log_percent
+        self.log_interval = log_interval
+        self.stream = stream if stream is not None else sys.stdout
+        self.interactive = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.started = time.monotonic()
+        self.last_time = self.started
+        self.last_percent = None
+        # count shown by the last drawn bar or log line
+        self.last_count = None
+        self.closed = False
+
+    def percent(self) -> float | None:
+        """
+        Return the percentage of processed items, None when the total is unknown.
+        """
+        if self.total is None:
+            return None
+        return min(100.0, 100.0 * self.count / self.total)
+
+    def update(self, count: int = 1) -> None:
+        """
+        Add count processed items and report progress if it is due.
+        """
+        self.count += count
+        self._report()
+
+    def advance_to(self, count: int) -> None:
+        """
+        Set the number of processed items, e.g. from a per-batch callback, and report progress if it is due.
+        """
+        self.count = count
+        self._report()
+
+    def iter(self, iterable: Iterable) -> Iterator:
+        """
+        Yield items of the iterable, counting each of them.
+        """
+        for item in iterable:
+            self.update()
+            yield item
+
+    def _report(self) -> None:
+        now = time.monotonic()
+        interval = self.min_interval if self.interactive else self.log_interval
+        percent = self.percent()
+
+        if self.interactive:
+            if now - self.last_time < interval:
+                return
+            if percent is not None and self.last_percent is not None \
+                    and percent - self.last_percent < self.min_percent:
+                return
+            self._draw()
+        else:
+            if percent is not None:
+                if self.last_percent is not None and percent - self.last_percent < self.log_percent:
+                    return
+            elif now - self.last_time < interval:
+                return
+            self._log()
+
+        self.last_time = now
+        self.last_percent = percent
+
+    def _draw(self) -> None:
+        percent = self.percent()
+        if percent is None:
+            self.stream.write(f'\r{self.label}: {self.count}')
+        else:
+            filled = int(self.BAR_WIDTH * percent // 100)
+            bar = '█' * filled + ' ' * (self.BAR_WIDTH - filled)
+            self.stream.write(f'\r{self.label}: {bar} {self.count}/{self.total}')
+        self.stream.flush()
+        self.last_count = self.count
+
+    def _log(self) -> None:
+        percent = self.percent()
+        logger.info('label=%r done=%d total=%s percent=%s elapsed=%.1fs',
+                    self.label,
+                    self.count,
+                    self.total if self.total is not None else '-',
+                    f'{percent:.0f}' if percent is not None else '-',
+                    time.monotonic() - self.started)
+        self.last_count = self.count
+
+    def close(self) -> None:
+        """
+        Report the final state, unless it was already reported, and finish the progress line.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        reported = self.count == self.last_count
+        if self.interactive:
+            if not reported:
+                self._draw()
+            self.stream.write('\n')
+            self.stream.flush()
+        elif not reported:
+            self._log()
+
+    def __enter__(self) -> 'Progress':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
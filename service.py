@@ -0,0 +1,322 @@
+"""
+service.py
+This module defines the QueryService class, a local asyncio HTTP service answering JSON queries
+about people, readers and authorizations, so scripts do not have to open the database themselves.
+Queries run on a bounded pool of read-only connections and results are cached
+until the database file is rebuilt.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from urllib.parse import unquote, urlsplit
+from database import Database
+from reader import ReaderRegistry
+from formater import normalizer
+
+logger = logging.getLogger('service')
+
+
+def database_generation(db_name: str) -> tuple:
+    """
+    This function returns identity, modification time and size of the database file and its WAL file.
+    It changes whenever the database is written or replaced by a rebuild.
+    """
+    generation = []
+    for path in (db_name, f'{db_name}-wal'):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            generation.append(None)
+        else:
+            generation.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+
+    return tuple(generation)
+
+
+class ConnectionPool:
+    """
+    This class is a bounded pool of read-only database connections.
+    At most size connections are open, further requests wait for a free one.
+    Connections opened before the database changed are closed instead of being reused,
+    so a rebuilt database file is never read through a connection to the old one.
+    """
+    def __init__(self, db_name: str, size: int = 4) -> None:
+        self.db_name = db_name
+        self.size = size
+        self.idle = []
+        self.semaphore = asyncio.Semaphore(size)
+
+    @asynccontextmanager
+    async def connection(self, generation: tuple) -> AsyncIterator[Database]:
+        """
+        This method lends a connection opened at the given database generation.
+        """
+        async with self.semaphore:
+            db = None
+            while self.idle and db is None:
+                idle_generation, idle_db = self.idle.pop()
+                if idle_generation == generation:
+                    db = idle_db
+                else:
+                    idle_db.close()
+            if db is None:
+                db = await asyncio.to_thread(Database,
+                                             self.db_name,
+                                             read_only=True,
+                                             check_same_thread=False)
+
+            try:
+                yield db
+            except BaseException:
+                db.close()
+                raise
+            self.idle.append((generation, db))
+
+    def close(self) -> None:
+        """
+        This method closes all idle connections.
+        """
+        while self.idle:
+            self.idle.pop()[1].close()
+
+
+class ResultCache:
+    """
+    This class is a bounded LRU cache of query results.
+    All results are dropped when the database generation changes.
+    """
+    def __init__(self, size: int = 1024) -> None:
+        self.size = size
+        self.results = OrderedDict()
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, generation: tuple) -> list | None:
+        """
+        This method returns the cached result of the query, None when it is not cached.
+        """
+        if generation != self.generation:
+            self.results.clear()
+            self.generation = generation
+        result = self.results.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.results.move_to_end(key)
+        return result
+
+    def put(self, key: tuple, generation: tuple, result: list) -> None:
+        """
+        This method stores the result of the query computed at the given generation.
+        """
+        if generation != self.generation or self.size <= 0:
+            return
+        self.results[key] = result
+        self.results.move_to_end(key)
+        while len(self.results) > self.size:
+            self.results.popitem(last=False)
+
+
+def person_result(db: Database, row: tuple) -> dict:
+    """
+    This function returns a person row with numbers of readers the person can open.
+    """
+    person_number, first_name, last_name, card_number, email = row
+    return {
+        'person_number': person_number,
+        'first_name': first_name,
+        'last_name': last_name,
+        'card_number': card_number,
+        'email': email,
+        'readers': db.select_person_readers(person_number),
+    }
+
+
+def reader_result(db: Database, row: tuple) -> dict:
+    """
+    This function returns a reader row with numbers of people who can open it.
+    """
+    reader_number, location_blueprint, location_hospital, location_name, abi_location = row
+    return {
+        'reader_number': reader_number,
+        'location_blueprint': location_blueprint,
+        'location_hospital': location_hospital,
+        'location_name': location_name,
+        'abi_location': abi_location,
+        'people': db.select_reader_people(reader_number),
+    }
+
+
+def run_query(db: Database, kind: str, value: str) -> list[dict]:
+    """
+    This function answers a query on the connection, e.g. ('reader', '01234').
+    Reader and blueprint queries return readers with people who can open them,
+    other queries return people with readers they can open.
+    """
+    if kind == 'reader':
+        row = db.select_reader(ReaderRegistry.key(value))
+        return [reader_result(db, row)] if row is not None else []
+    if kind == 'blueprint':
+        return [reader_result(db, row)
+                for row in db.select_readers_by_blueprint(normalizer.normalize(value))]
+    if kind == 'person':
+        row = db.select_person(value)
+        return [person_result(db, row)] if row is not None else []
+    if kind == 'card':
+        return [person_result(db, row) for row in db.select_people_by_card(value)]
+    if kind == 'email':
+        return [person_result(db, row) for row in db.select_people_by_email(value)]
+
+    raise KeyError(kind)
+
+
+class QueryService:
+    """
+    This class serves queries over HTTP on localhost or a Unix socket.
+    GET /<query>/<value> returns JSON results, where query is reader, person, card, email
+    or blueprint, e.g. GET /reader/01234. GET /health returns the state of the service.
+    """
+    QUERIES = ('reader', 'person', 'card', 'email', 'blueprint')
+    REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               500: 'Internal Server Error', 503: 'Service Unavailable'}
+    REQUEST_TIMEOUT = 10.0
+
+    def __init__(self, db_name: str, pool_size: int = 4, cache_size: int = 1024) -> None:
+        self.db_name = db_name
+        self.pool = ConnectionPool(db_name, pool_size)
+        self.cache = ResultCache(cache_size)
+
+    async def query(self, kind: str, value: str) -> list[dict]:
+        """
+        This method answers a query from the cache or on a pooled connection.
+        """
+        if kind not in self.QUERIES:
+            raise KeyError(kind)
+        value = value.strip()
+        generation = database_generation(self.db_name)
+        result = self.cache.get((kind, value), generation)
+        if result is None:
+            async with self.pool.connection(generation) as db:
+                result = await asyncio.to_thread(run_query, db, kind, value)
+            self.cache.put((kind, value), generation, result)
+
+        return result
+
+    async def respond(self, method: str, target: str) -> tuple[int, dict]:
+        """
+        This method returns the status and the JSON body answering a request.
+        """
+        if method != 'GET':
+            return 405, {'error': f'Method {method} is not allowed'}
+
+        parts = [unquote(part) for part in urlsplit(target).path.strip('/').split('/', 1)]
+        if parts == ['health']:
+            return 200, {'status': 'ok',
+                         'database': self.db_name,
+                         'cached': len(self.cache.results),
+                         'hits': self.cache.hits,
+                         'misses': self.cache.misses}
+        if len(parts) != 2 or parts[0] not in self.QUERIES or not parts[1]:
+            return 404, {'error': f'Unknown path {target}, use /<query>/<value> '
+                                  f'with query one of {", ".join(self.QUERIES)}'}
+
+        try:
+            results = await self.query(parts[0], parts[1])
+        except sqlite3.Error as error:
+            logger.warning('query=%s value=%r error=%s', parts[0], parts[1], error)
+            return 503, {'error': f'Database is not available: {error}'}
+        return 200, {'query': parts[0], 'value': parts[1], 'results': results}
+
+    async def handle(self,
+                     reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter) -> None:
+        """
+        This method reads one HTTP request from the client and writes the JSON response.
+        """
+        try:
+            try:
+                request_line = await asyncio.wait_for(reader.readline(), self.REQUEST_TIMEOUT)
+                while True:
+                    header = await asyncio.wait_for(reader.readline(), self.REQUEST_TIMEOUT)
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            except (ValueError, asyncio.TimeoutError, asyncio.LimitOverrunError):
+                status, body = 400, {'error': 'Malformed request'}
+            else:
+                try:
+                    status, body = await self.respond(method, target)
+                except Exception: # pylint: disable=W0718
+                    logger.exception('method=%s target=%s', method, target)
+                    status, body = 500, {'error': 'Internal error'}
+
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            writer.write(f'HTTP/1.1 {status} {self.REASONS[status]}\r\n'
+                         'Content-Type: application/json; charset=utf-8\r\n'
+                         f'Content-Length: {len(payload)}\r\n'
+                         'Connection: close\r\n\r\n'.encode('latin-1') + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self,
+                    host: str = '127.0.0.1',
+                    port: int = 8765,
+                    unix_path: str | None = None) -> asyncio.Server:
+        """
+        This method starts listening and returns the server, port 0 picks a free port,
+        e.g. server.sockets[0].getsockname()[1] is the port it is bound to.
+        """
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+
+        addresses = ', '.join(str(sock.getsockname()) for sock in server.sockets)
+        logger.info('Serving %s on %s', self.db_name, addresses)
+        return server
+
+    async def serve(self,
+                    host: str = '127.0.0.1',
+                    port: int = 8765,
+                    unix_path: str | None = None) -> None:
+        """
+        This method serves requests until it is cancelled.
+        """
+        server = await self.start(host, port, unix_path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pool.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve queries over the readers database.')
+    parser.add_argument('--database', default='database.db', help='path of the database')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on')
+    parser.add_argument('--unix', metavar='PATH', default=None,
+                        help='listen on a Unix socket instead of a TCP port')
+    parser.add_argument('--pool-size', type=int, default=4,
+                        help='maximum number of open database connections')
+    parser.add_argument('--cache-size', type=int, default=1024,
+                        help='maximum number of cached query results, 0 disables the cache')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(message)s')
+
+    service = QueryService(args.database, args.pool_size, args.cache_size)
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
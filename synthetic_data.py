@@ -0,0 +1,314 @@
+"""
+synthetic_data.py
+This module generates synthetic source documents for benchmarks and for trying the pipeline
+without the confidential exports.
+Files follow the column layouts described in readme.md, names contain czech diacritics
+and room codes use the A-PR-500 style handled by formater.change_string_format.
+"""
+import argparse
+import os
+import random
+import openpyxl as opx
+from unidecode import unidecode
+from formater import change_string_format
+
+
+SOURCE_FILES = (
+    'export_readers.xlsx',
+    'export_readers_app.xlsx',
+    'export_employees.xlsx',
+    'export_efas.xlsx',
+    )
+
+FEMALE_FIRST_NAMES = (
+    'Jana', 'Marie', 'Eva', 'Hana', 'Anna', 'Lenka', 'Kateřina', 'Lucie', 'Věra', 'Alena',
+    'Petra', 'Veronika', 'Jaroslava', 'Tereza', 'Martina', 'Michaela', 'Jitka', 'Helena',
+    'Ludmila', 'Zdeňka', 'Ivana', 'Monika', 'Zuzana', 'Markéta', 'Barbora', 'Kristýna',
+    'Dagmar', 'Renata', 'Šárka', 'Božena',
+    )
+MALE_FIRST_NAMES = (
+    'Jiří', 'Jan', 'Petr', 'Josef', 'Pavel', 'Martin', 'Tomáš', 'Jaroslav', 'Miroslav', 'Zdeněk',
+    'Václav', 'Michal', 'František', 'Jakub', 'Milan', 'Karel', 'Lukáš', 'David', 'Vladimír',
+    'Ondřej', 'Ladislav', 'Roman', 'Stanislav', 'Marek', 'Radek', 'Daniel', 'Antonín', 'Vojtěch',
+    'Filip', 'Přemysl',
+    )
+# male and female forms of the same surname
+LAST_NAMES = (
+    ('Novák', 'Nováková'), ('Svoboda', 'Svobodová'), ('Novotný', 'Novotná'),
+    ('Dvořák', 'Dvořáková'), ('Černý', 'Černá'), ('Procházka', 'Procházková'),
+    ('Kučera', 'Kučerová'), ('Veselý', 'Veselá'), ('Horák', 'Horáková'),
+    ('Němec', 'Němcová'), ('Marek', 'Marková'), ('Pospíšil', 'Pospíšilová'),
+    ('Pokorný', 'Pokorná'), ('Hájek', 'Hájková'), ('Král', 'Králová'),
+    ('Jelínek', 'Jelínková'), ('Růžička', 'Růžičková'), ('Beneš', 'Benešová'),
+    ('Fiala', 'Fialová'), ('Sedláček', 'Sedláčková'), ('Doležal', 'Doležalová'),
+    ('Zeman', 'Zemanová'), ('Kolář', 'Kolářová'), ('Navrátil', 'Navrátilová'),
+    ('Čermák', 'Čermáková'), ('Vaněk', 'Vaňková'), ('Urban', 'Urbanová'),
+    ('Blažek', 'Blažková'), ('Kříž', 'Křížová'), ('Kovář', 'Kovářová'),
+    ('Bartoš', 'Bartošová'), ('Vlček', 'Vlčková'), ('Polák', 'Poláková'),
+    ('Musil', 'Musilová'), ('Kopecký', 'Kopecká'), ('Šimek', 'Šimková'),
+    ('Konečný', 'Konečná'), ('Malý', 'Malá'), ('Holub', 'Holubová'),
+    ('Štěpánek', 'Štěpánková'), ('Kadlec', 'Kadlecová'), ('Dostál', 'Dostálová'),
+    ('Soukup', 'Soukupová'), ('Šťastný', 'Šťastná'), ('Mareš', 'Marešová'),
+    ('Moravec', 'Moravcová'), ('Sýkora', 'Sýkorová'), ('Tichý', 'Tichá'),
+    ('Valenta', 'Valentová'), ('Vávra', 'Vávrová'),
+    )
+# syllables and endings of generated surnames, the real ones alone would make most names ambiguous
+SURNAME_SYLLABLES = (
+    'Bo', 'Ha', 'Ko', 'Ma', 'Pe', 'Ra', 'Si', 'Vo', 'Zá', 'Dě',
+    'Ku', 'Li', 'No', 'Ře', 'Tu', 'Fi', 'Je', 'Mu', 'Po', 'Še',
+    )
+SURNAME_ENDINGS = (
+    ('lík', 'líková'), ('ček', 'čková'), ('nský', 'nská'), ('řík', 'říková'),
+    ('ták', 'táková'), ('vec', 'vcová'), ('ner', 'nerová'), ('šek', 'šková'),
+    )
+TITLES = ('Bc.', 'Mgr.', 'MUDr.', 'Ing.', 'PhDr.', 'DiS.')
+BUILDINGS = ('A', 'B', 'C', 'D', 'D1', 'E', 'S')
+FLOORS = ('PR', 'S1', 'P1', 'P2', 'P3', 'P4', 'P5', 'P6', 'P8', 'P10', 'P12')
+HOSPITALS = ('Nemocnice Sever', 'Nemocnice Jih', 'Poliklinika Střed')
+ROOM_NAMES = (
+    'Sesterna', 'Pokoj lékařů', 'Vyšetřovna', 'Čistící místnost', 'Sklad léčiv',
+    'Denní místnost', 'Šatna personálu', 'Zákrokový sál', 'Příjmová ambulance',
+    'Operační sál', 'Laboratoř', 'Archiv', 'Jednotka intenzivní péče', 'Dospávací pokoj',
+    'Čekárna', 'Kancelář primáře', 'Rehabilitace', 'Umývárna', 'Kuchyňka', 'Serverovna',
+    )
+NAME_SUFFIXES = (None, None, None, 'vstup', 'zadní vchod', 'chodba', 'přístavba')
+READER_TYPES = ('entry', 'exit', 'entry/exit', 'turnstile')
+
+
+class SyntheticData:
+    """
+    This class generates synthetic source documents of a given scale.
+    Scale is the number of readers and of employees, rooms are shared by about two readers.
+    The data contains the irregularities of the real exports: reader numbers with and without
+    leading zeros, readers missing from one of the exports, rooms without readers,
+    names listed as 'first last' or 'last first' and names of people missing in the employee export.
+    Output is reproducible for the same scale and seed.
+    """
+    def __init__(self, scale: int, seed: int = 0) -> None:
+        if scale < 1:
+            raise ValueError(f'Scale must be positive, got {scale}')
+        self.scale = scale
+        self.random = random.Random(seed)
+        self.rooms = self.generate_rooms()
+        self.readers = self.generate_readers()
+        self.people = self.generate_people()
+
+    def room_code(self) -> str:
+        """
+        This method returns a random room code in the A-PR-500 style.
+        """
+        # numbers grow with the scale, so there are enough unique codes
+        number = self.random.randint(1, max(999, self.scale))
+        suffix = self.random.choice('abc') if self.random.random() < 0.05 else ''
+        return f'{self.random.choice(BUILDINGS)}-{self.random.choice(FLOORS)}-{number}{suffix}'
+
+    def generate_rooms(self) -> list[tuple]:
+        """
+        This method generates unique rooms as (code, name, name suffix, hospital) tuples.
+        """
+        count = max(1, self.scale // 2)
+        codes = set()
+        rooms = []
+        while len(rooms) < count:
+            code = self.room_code()
+            # codes differing only in case are the same room
+            if code.upper() in codes:
+                continue
+            codes.add(code.upper())
+            rooms.append((code,
+                          self.random.choice(ROOM_NAMES),
+                          self.random.choice(NAME_SUFFIXES),
+                          self.random.choice(HOSPITALS)))
+
+        return rooms
+
+    def generate_readers(self) -> list[tuple]:
+        """
+        This method generates readers as (reader number, room) tuples,
+        every room gets at least one reader and a few readers have no room.
+        """
+        numbers = self.random.sample(range(1, self.scale * 3 + 1), self.scale)
+        readers = []
+        for position, number in enumerate(numbers):
+            if position < len(self.rooms):
+                room = self.rooms[position]
+            elif self.random.random() < 0.02:
+                room = None
+            else:
+                room = self.random.choice(self.rooms)
+            readers.append((number, room))
+
+        return readers
+
+    def last_name(self, female: bool) -> str:
+        """
+        This method returns a common czech surname or a generated one, in male or female form.
+        """
+        if self.random.random() < 0.3:
+            return self.random.choice(LAST_NAMES)[1 if female else 0]
+        stem = self.random.choice(SURNAME_SYLLABLES) + self.random.choice(SURNAME_SYLLABLES).lower()
+        return stem + self.random.choice(SURNAME_ENDINGS)[1 if female else 0]
+
+    def generate_people(self) -> list[tuple]:
+        """
+        This method generates employees as (person number, email, first name, last name, title, card number) tuples.
+        """
+        person_numbers = self.random.sample(range(100000, 100000 + self.scale * 10), self.scale)
+        card_numbers = self.random.sample(range(1000000, 1000000 + self.scale * 10), self.scale)
+        people = []
+        for person_number, card_number in zip(person_numbers, card_numbers):
+            female = self.random.random() < 0.7
+            first_name = self.random.choice(FEMALE_FIRST_NAMES if female else MALE_FIRST_NAMES)
+            last_name = self.last_name(female)
+            email = f'{unidecode(first_name)}.{unidecode(last_name)}{person_number % 1000}@nemocnice.cz'
+            title = self.random.choice(TITLES) if self.random.random() < 0.4 else None
+            people.append((str(person_number),
+                           email.lower(),
+                           first_name,
+                           last_name,
+                           title,
+                           str(card_number)))
+
+        return people
+
+    def person_name(self) -> str | None:
+        """
+        This method returns the name of a random employee the way the room export writes it,
+        sometimes of a person missing in the employee export or no name at all.
+        """
+        chance = self.random.random()
+        if chance < 0.05:
+            return None
+        if chance < 0.08:
+            return f'{self.random.choice(FEMALE_FIRST_NAMES)} Nezaměstnaná'
+        _, _, first_name, last_name, _, _ = self.random.choice(self.people)
+        if chance < 0.3:
+            return f'{last_name} {first_name}'
+        return f'{first_name} {last_name}'
+
+    @staticmethod
+    def save(path: str, rows, header: list[str] | None = None) -> None:
+        """
+        This method writes rows into a new write-only workbook.
+        """
+        workbook = opx.Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        if header is not None:
+            sheet.append(header)
+        for row in rows:
+            sheet.append(row)
+        workbook.save(path)
+
+    def write_readers(self, path: str) -> None:
+        """
+        This method writes export_readers.xlsx: budova, cislo ctecky, cislo mistnosti, nazev mistnosti.
+        """
+        rows = []
+        for number, room in self.readers:
+            if room is None:
+                rows.append((self.random.choice(BUILDINGS), number, None, None))
+                continue
+            code, name, _, _ = room
+            building = code.split('-')[0]
+            # the room export is not consistent in case and whitespace
+            if self.random.random() < 0.1:
+                code = f' {code.lower()} '
+            rows.append((building, number, code, name))
+
+        self.save(path, rows)
+
+    def write_readers_app(self, path: str) -> None:
+        """
+        This method writes export_readers_app.xlsx: id, reader_number, reader_location, reader_type,
+        reader_abi_location. Most readers are listed, some with leading zeros,
+        and a few readers exist only in this export.
+        """
+        rows = []
+        for number, room in self.readers:
+            if self.random.random() < 0.05:
+                continue
+            reader_number = f'{number:05d}' if self.random.random() < 0.5 else str(number)
+            location = room[1] if room is not None else None
+            abi_location = f'ABI-{room[0].upper()}' if room is not None else None
+            rows.append([reader_number, location, self.random.choice(READER_TYPES), abi_location])
+
+        extra_number = self.scale * 3 + 1
+        for extra in range(max(1, self.scale // 50)):
+            rows.append([str(extra_number + extra), None, self.random.choice(READER_TYPES), None])
+
+        self.random.shuffle(rows)
+        self.save(path, ([row_id, *row] for row_id, row in enumerate(rows, start=1)))
+
+    def write_employees(self, path: str) -> None:
+        """
+        This method writes export_employees.xlsx: icp, email, jmeno, prijmeni, titul, cislokarty.
+        """
+        self.save(path, self.people)
+
+    def write_efas(self, path: str) -> None:
+        """
+        This method writes export_efas.xlsx with a header row: Kod mistnosti, Nazev standard,
+        Doplnek nazvu, Kod projekt, Vrchni sestra, Stanicni sestra, Najemce.
+        Kod projekt holds the room code formatted by change_string_format, e.g. A-PR.500.
+        """
+        header = ['Kod mistnosti',
+                  'Nazev standard',
+                  'Doplnek nazvu',
+                  'Kod projekt',
+                  'Vrchni sestra\\Ved.odb',
+                  'Stanicni sestra/Ved.odb',
+                  'Najemce']
+        rows = []
+        for position, (code, name, suffix, hospital) in enumerate(self.rooms):
+            rows.append((f'M{position:06d}',
+                         name,
+                         suffix,
+                         change_string_format(code),
+                         self.person_name(),
+                         self.person_name(),
+                         hospital))
+
+        # rooms without readers
+        for position in range(max(1, len(self.rooms) // 20)):
+            rows.append((f'X{position:06d}',
+                         self.random.choice(ROOM_NAMES),
+                         None,
+                         change_string_format(f'Z-P1-{position}'),
+                         self.person_name(),
+                         None,
+                         self.random.choice(HOSPITALS)))
+
+        self.random.shuffle(rows)
+        self.save(path, rows, header)
+
+    def write(self, directory: str) -> list[str]:
+        """
+        This method writes all source documents into the directory and returns their paths.
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = [os.path.join(directory, file_name) for file_name in SOURCE_FILES]
+        self.write_readers(paths[0])
+        self.write_readers_app(paths[1])
+        self.write_employees(paths[2])
+        self.write_efas(paths[3])
+        return paths
+
+
+def generate(directory: str, scale: int, seed: int = 0) -> list[str]:
+    """
+    This function writes synthetic source documents of the given scale into the directory.
+    """
+    return SyntheticData(scale, seed).write(directory)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic source documents.')
+    parser.add_argument('--scale', type=int, default=1000, help='number of readers and employees')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random generator')
+    parser.add_argument('--output',
+                        default='synthetic_documents',
+                        help='directory the source documents are written to')
+    args = parser.parse_args()
+
+    for generated_path in generate(args.output, args.scale, args.seed):
+        print(f'Generated {generated_path}')
@@ -0,0 +1,51 @@
+"""
+conftest.py
+Makes the modules in the repository root importable from tests and provides shared fixtures.
+Modules import Database.py, Formater.py, Person.py and Reader.py by lowercase names,
+which only resolve on case-insensitive filesystems, so the lowercase names are mapped
+to the files here.
+"""
+import importlib.abc
+import importlib.util
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class LowercaseModuleFinder(importlib.abc.MetaPathFinder):
+    """
+    This class finds modules of the repository root whose file names are not lowercase
+    under their lowercase names.
+    """
+    def __init__(self, directory: str) -> None:
+        self.paths = {file_name[:-3].lower(): os.path.join(directory, file_name)
+                      for file_name in os.listdir(directory)
+                      if file_name.endswith('.py') and file_name != file_name.lower()}
+
+    def find_spec(self, fullname, path, target=None):
+        if path is not None or fullname not in self.paths:
+            return None
+        return importlib.util.spec_from_file_location(fullname, self.paths[fullname])
+
+
+sys.meta_path.insert(0, LowercaseModuleFinder(ROOT))
+
+# pylint: disable=C0413
+from data_readers import source_cache, workbook_cache
+from synthetic_data import SyntheticData
+
+
+@pytest.fixture
+def source_documents(tmp_path, monkeypatch):
+    """
+    Synthetic source documents in source_documents/ of a temporary working directory,
+    read without the source cache. Returns paths keyed by readers, readers_app, employees and efas.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(source_cache, 'enabled', False)
+    paths = SyntheticData(300, seed=5).write('source_documents')
+    yield dict(zip(('readers', 'readers_app', 'employees', 'efas'), paths))
+    workbook_cache.clear()
@@ -0,0 +1,51 @@
+"""
+test_authorization_mapper.py
+Compares the indexed AuthorizationMapper.map_data with the nested-loop implementation it replaced.
+"""
+from data_readers import AuthorizationMapper, PersonMapper, ReaderMapper
+
+
+def nested_loop_map_data(rows: list, readers: list, personel: list) -> list:
+    """
+    The original AuthorizationMapper.map_data, comparing every row with every reader and person.
+    """
+    for row in rows:
+        for reader in readers:
+            if str(reader.location_blueprint).strip() == str(row[3]).strip() \
+                    and reader.location_blueprint is not None:
+                reader.location_hospital = str(row[0])
+                if row[2] is not None:
+                    reader.location_name = f'{row[1]} ({row[2]})'
+                else:
+                    reader.location_name = row[1]
+                names = str(row[4]).casefold().split(), str(row[5]).casefold().split()
+
+                for name in names:
+                    for person in personel:
+                        if set((person.first_name.casefold(), person.last_name.casefold())) == set(name):
+                            reader.add_person(person)
+
+    return readers
+
+
+def map_sources(paths: dict) -> tuple[list, list]:
+    return (ReaderMapper(paths['readers']).get_readers(),
+            PersonMapper(paths['employees']).get_people())
+
+
+def test_indexed_map_data_matches_nested_loop(source_documents):
+    readers, people = map_sources(source_documents)
+    indexed = AuthorizationMapper(source_documents['efas'], readers=readers, personel=people)
+    indexed_readers = indexed.get_authorizations()
+
+    reference_readers, reference_people = map_sources(source_documents)
+    reference_readers = nested_loop_map_data(indexed.data, reference_readers, reference_people)
+
+    assert any(reader.authorized_personel for reader in indexed_readers)
+    assert len(indexed_readers) == len(reference_readers)
+    for reader, reference in zip(indexed_readers, reference_readers):
+        assert reader.reader_number == reference.reader_number
+        assert [person.person_number for person in reader.authorized_personel] == \
+            [person.person_number for person in reference.authorized_personel]
+        assert (reader.location_blueprint, reader.location_hospital, reader.location_name) == \
+            (reference.location_blueprint, reference.location_hospital, reference.location_name)
@@ -0,0 +1,132 @@
+"""
+test_database.py
+Tests of the Database class on temporary SQLite files.
+"""
+import os
+import sqlite3
+import pytest
+from database import Database
+from person import Person
+from reader import Reader
+
+
+def readers(count: int) -> list[Reader]:
+    return [Reader(f'{number:05d}', location_blueprint=f'A-PR.{number}') for number in range(count)]
+
+
+def build(db: Database, count: int) -> None:
+    db.insert_readers(readers(count))
+
+
+def count_readers(db: Database) -> int:
+    db.cursor.execute('''SELECT COUNT(*) FROM readers''')
+    return db.cursor.fetchone()[0]
+
+
+def test_publish_is_seen_by_open_connections(tmp_path):
+    db_name = str(tmp_path / 'database.db')
+    live = Database(db_name)
+    build(live, 100)
+    live.close()
+    # an idle connection opened before the rebuild
+    reader = Database(db_name, read_only=True)
+    assert count_readers(reader) == 100
+
+    staging = Database.staging(db_name)
+    build(staging, 408)
+    staging.publish(db_name)
+
+    assert count_readers(reader) == 408
+    reader.close()
+    assert not os.path.exists(f'{db_name}.staging')
+    published = Database(db_name)
+    assert published.cursor.execute('''PRAGMA journal_mode''').fetchone()[0] == 'wal'
+    assert published.cursor.execute('''EXPLAIN QUERY PLAN SELECT * FROM readers
+                                    WHERE location_blueprint = ?''', ('A-PR.1',)).fetchone()[3] == \
+        'SEARCH readers USING INDEX readers_location_blueprint (location_blueprint=?)'
+    published.check_integrity()
+    published.close()
+
+
+def test_publish_keeps_live_database_when_integrity_check_fails(tmp_path):
+    db_name = str(tmp_path / 'database.db')
+    live = Database(db_name)
+    build(live, 100)
+    live.close()
+
+    staging = Database.staging(db_name)
+    build(staging, 10)
+    # foreign keys are not enforced while loading, the check finds the missing person
+    staging.cursor.execute('''INSERT INTO authorizations (person_number, reader_number)
+                           VALUES ('missing', '00001')''')
+    with pytest.raises(RuntimeError, match='references missing people'):
+        staging.publish(db_name)
+    staging.close()
+
+    live = Database(db_name, read_only=True)
+    assert count_readers(live) == 100
+    live.close()
+
+
+def test_migrate_version_0_database(tmp_path):
+    db_name = str(tmp_path / 'database.db')
+    conn = sqlite3.connect(db_name)
+    # schema written before the versioning, authorizations had no key and were inserted repeatedly
+    conn.execute('''CREATE TABLE people
+                 (person_number TEXT PRIMARY KEY, first_name TEXT, last_name TEXT, card_number TEXT, email TEXT)''')
+    conn.execute('''CREATE TABLE readers
+                 (reader_number TEXT PRIMARY KEY, location_blueprint TEXT, location_hospital TEXT,
+                 location_name TEXT, abi_location TEXT)''')
+    conn.execute('''CREATE TABLE authorizations
+                 (person_number TEXT,
+                 reader_number TEXT,
+                 FOREIGN KEY(person_number) REFERENCES people(person_number),
+                 FOREIGN KEY(reader_number) REFERENCES readers(reader_number))''')
+    conn.executemany('''INSERT INTO readers (reader_number) VALUES (?)''',
+                     [(f'{number:05d}',) for number in range(30)])
+    conn.executemany('''INSERT INTO people (person_number) VALUES (?)''',
+                     [(str(number),) for number in range(40)])
+    authorizations = [(str(person), f'{reader:05d}')
+                      for person in range(40) for reader in range(30) if (person + reader) % 3 == 0]
+    conn.executemany('''INSERT INTO authorizations VALUES (?, ?)''', authorizations * 2)
+    conn.execute('''INSERT INTO authorizations VALUES (NULL, '00001')''')
+    conn.commit()
+    conn.close()
+
+    db = Database(db_name)
+    assert db.schema_version() == Database.SCHEMA_VERSION
+    assert sorted(db.get_authorizations()) == sorted(authorizations)
+    assert len(db.get_people()) == 40
+    assert db.cursor.execute('''EXPLAIN QUERY PLAN SELECT person_number FROM authorizations
+                             WHERE reader_number = ?''', ('00001',)).fetchone()[3].startswith(
+        'SEARCH authorizations USING COVERING INDEX authorizations_reader_number')
+    assert db.cursor.execute('''EXPLAIN QUERY PLAN SELECT * FROM people WHERE card_number = ?''',
+                             ('1',)).fetchone()[3].startswith('SEARCH people USING INDEX people_card_number')
+    assert db.has_table('source_snapshot')
+    db.close()
+
+
+def test_upsert_and_sync_report_only_changes(tmp_path):
+    db = Database(str(tmp_path / 'database.db'))
+    jana = Person('1', 'Jana', 'Nováková', '1001', 'jana@example.com')
+    petr = Person('2', 'Petr', 'Svoboda', '1002', 'petr@example.com')
+    first, second = readers(2)
+    assert db.upsert_people([jana, petr]) == 2
+    assert db.upsert_readers([first, second]) == 2
+    assert db.sync_authorizations([(jana, first), (petr, first), (petr, second)]) == (3, 0)
+
+    # unchanged rows are not rewritten
+    assert db.upsert_people([jana, petr]) == 0
+    assert db.upsert_readers([first, second]) == 0
+    assert db.sync_authorizations([(jana, first), (petr, first), (petr, second)]) == (0, 0)
+
+    # one changed field updates one row
+    assert db.upsert_people([Person('1', 'Jana', 'Nováková', '2001', 'jana@example.com'), petr]) == 1
+    assert db.select_person('1')[3] == '2001'
+    assert db.upsert_readers([Reader(first.reader_number, first.location_blueprint, 'FN'), second]) == 1
+    assert db.select_reader(first.reader_number)[2] == 'FN'
+
+    # an authorization missing from the source is deleted
+    assert db.sync_authorizations([(jana, first), (petr, second)]) == (0, 1)
+    assert sorted(db.get_authorizations()) == [('1', first.reader_number), ('2', second.reader_number)]
+    db.close()
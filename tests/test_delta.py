@@ -0,0 +1,75 @@
+"""
+test_delta.py
+Compares a delta run after rows were removed from the source documents with a full build.
+"""
+import openpyxl as opx
+from data_readers import (AuthorizationMapper, PersonMapper, ReaderMapper, ABILocationMapper, VelinMapper,
+                          workbook_cache)
+from database import Database
+from delta import DeltaPipeline
+from reader import ReaderRegistry
+from synthetic_data import SyntheticData
+
+
+def remove_rows(path: str, remove, header: bool = False) -> None:
+    """
+    Rewrite the workbook without rows for which remove returns True.
+    """
+    workbook = opx.load_workbook(path, read_only=True)
+    rows = list(workbook.active.iter_rows(values_only=True))
+    workbook.close()
+    if header:
+        SyntheticData.save(path, (row for row in rows[1:] if not remove(row)), list(rows[0]))
+    else:
+        SyntheticData.save(path, (row for row in rows if not remove(row)))
+    workbook_cache.clear()
+
+
+def full_build(db: Database) -> None:
+    """
+    Build the database from all source rows, as main.py does without --delta.
+    """
+    registry = ReaderRegistry(ReaderMapper('source_documents/export_readers.xlsx').get_readers())
+    ABILocationMapper('source_documents/export_readers_app.xlsx', readers=registry).get_readers()
+    readers = VelinMapper('source_documents/export_readers_app.xlsx', readers=registry).get_readers()
+    people = PersonMapper('source_documents/export_employees.xlsx').get_people()
+    AuthorizationMapper('source_documents/export_efas.xlsx', readers=readers, personel=people).get_authorizations()
+
+    db.insert_readers(readers)
+    db.insert_people(person for reader in readers for person in reader.authorized_personel)
+    db.insert_authorizations((person, reader) for reader in readers for person in reader.authorized_personel)
+
+
+def contents(db: Database) -> tuple[list, list, list]:
+    return sorted(db.get_people()), sorted(db.get_readers()), sorted(db.get_authorizations())
+
+
+def test_delta_run_after_removing_rows_matches_full_build(source_documents):
+    db = Database('delta.db')
+    DeltaPipeline(db).run()
+
+    # readers authorizing people, removed from both reader documents
+    removed_readers = {ReaderRegistry.key(row[1]) for row in db.get_authorizations()[:40:4]}
+    # authorized employees, some of them left without authorizations by the removed readers
+    removed_people = {row[0] for row in db.get_authorizations()[1:60:6]}
+    remove_rows(source_documents['readers'],
+                lambda row: row[1] is not None and ReaderRegistry.key(row[1]) in removed_readers)
+    remove_rows(source_documents['readers_app'],
+                lambda row: row[1] is not None and ReaderRegistry.key(row[1]) in removed_readers)
+    remove_rows(source_documents['employees'],
+                lambda row: str(row[0]) in removed_people)
+
+    result = DeltaPipeline(db).run()
+    delta_contents = contents(db)
+    db.close()
+
+    full_db = Database('full.db')
+    full_build(full_db)
+    full_contents = contents(full_db)
+    full_db.close()
+
+    assert result['deleted_readers'] == len(removed_readers)
+    assert result['deleted_people'] >= len(removed_people)
+    assert not {row[0] for row in delta_contents[0]} & removed_people
+    assert not {ReaderRegistry.key(row[0]) for row in delta_contents[1]} & removed_readers
+    assert delta_contents == full_contents
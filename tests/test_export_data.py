@@ -0,0 +1,60 @@
+"""
+test_export_data.py
+Compares reports written by ExportData.export_all in one pass with the standalone exports.
+"""
+import os
+import pytest
+from database import Database
+from export_data import ExportData
+from person import Person
+from reader import Reader
+
+JANA = Person('1', 'Jana', 'Nováková', '1001', 'jana@example.com')
+PETR = Person('2', 'Petr', 'Svoboda', '1002', 'petr@example.com')
+# authorized for nothing, still listed in the departments report
+KAREL = Person('3', 'Karel', 'Dvořák', '1003', None)
+READERS = [Reader('00042', 'A-PR.500', 'FN', 'Ambulance'), Reader('01234', 'B-P1.10', 'FN', 'Kancelar'),
+           Reader('00007', 'C-P2.1', 'FN', 'Sklad')]
+
+
+@pytest.fixture
+def export(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = Database('database.db')
+    db.insert_people([JANA, PETR, KAREL])
+    db.insert_readers(READERS)
+    db.insert_authorizations([(JANA, READERS[0]), (JANA, READERS[1]), (PETR, READERS[1])])
+    yield ExportData(db)
+    db.close()
+
+
+def read_outputs() -> dict[str, list[str]]:
+    """
+    Return sorted lines of every output file, the standalone authorizations export is not ordered.
+    """
+    outputs = {}
+    for file_name in os.listdir(ExportData.OUTPUT_DIRECTORY):
+        with open(os.path.join(ExportData.OUTPUT_DIRECTORY, file_name), encoding='utf-8') as file:
+            outputs[file_name] = sorted(file)
+    return outputs
+
+
+def test_export_all_matches_standalone_exports(export):
+    export.export_authorizations('csv')
+    export.export_readers('csv')
+    export.export_departments('csv')
+    standalone = read_outputs()
+
+    written = export.export_all(output_format='csv')
+
+    assert written == {'authorizations': 4, 'readers': 3, 'departments': 3}
+    assert read_outputs() == standalone
+    assert ',,,,,00007,C-P2.1,FN,Sklad,\n' in standalone['AuthorizationsOutput.csv']
+    assert ',Dvořák,dvorak3,\n' in standalone['DepartmentsOutput.csv']
+    assert ',Nováková,novakova1,00042 01234 \n' in standalone['DepartmentsOutput.csv']
+
+
+def test_export_all_rejects_unknown_reports(export):
+    with pytest.raises(ValueError, match='Unknown reports: rooms'):
+        export.export_all(['readers', 'rooms'], output_format='csv')
+    assert not os.path.exists(ExportData.OUTPUT_DIRECTORY)
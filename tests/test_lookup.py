@@ -0,0 +1,70 @@
+"""
+test_lookup.py
+Tests of AccessIndex queries over a temporary database.
+"""
+import pytest
+from database import Database
+from lookup import AccessIndex, read_queries
+from person import Person
+from reader import Reader
+
+JANA = Person('1', 'Jana', 'Nováková', '1001', 'Jana.Novakova@example.com')
+PETR = Person('2', 'Petr', 'Svoboda', '1002', 'petr@example.com')
+NAMESAKE = Person('3', 'Petr', 'Svoboda', '1002', None)
+ENTRANCE = Reader('00042', 'A-PR.500', 'FN', 'Ambulance', 'ABI-A-PR-500')
+STORE = Reader('00043', 'A-PR.500', 'FN', 'Sklad', None)
+OFFICE = Reader('01234', 'B-P1.10', 'FN', 'Kancelar', None)
+
+
+@pytest.fixture
+def index(tmp_path):
+    db = Database(str(tmp_path / 'database.db'))
+    db.insert_people([JANA, PETR, NAMESAKE])
+    db.insert_readers([ENTRANCE, STORE, OFFICE])
+    db.insert_authorizations([(JANA, ENTRANCE), (JANA, STORE), (PETR, ENTRANCE), (NAMESAKE, OFFICE)])
+    db.close()
+
+    db = Database(str(tmp_path / 'database.db'), read_only=True)
+    try:
+        yield AccessIndex(db)
+    finally:
+        db.close()
+
+
+def test_interned_indexes(index):
+    assert len(index.people) == 3
+    assert len(index.readers) == 3
+    entrance = index.reader_ids['00042']
+    assert sorted(index.people[person_id][0] for person_id in index.reader_people[entrance]) == ['1', '2']
+    assert [index.readers[reader_id][0] for reader_id in index.person_readers[index.person_ids['1']]] == \
+        ['00042', '00043']
+
+
+@pytest.mark.parametrize('value', ['00042', '42', ' 042 '])
+def test_reader_query_uses_canonical_number(index, value):
+    [reader] = index.query('reader', value)
+    assert reader['reader_number'] == '00042'
+    assert reader['location_name'] == 'Ambulance'
+    assert sorted(reader['people']) == ['1', '2']
+
+
+def test_person_card_and_email_queries(index):
+    assert index.query('person', '1')[0]['readers'] == ['00042', '00043']
+    assert [person['person_number'] for person in index.query('card', '1002')] == ['2', '3']
+    assert [person['person_number'] for person in index.query('email', 'jana.NOVAKOVA@example.com ')] == ['1']
+    assert index.query('person', '99') == []
+    assert index.query('email', 'nobody@example.com') == []
+
+
+def test_blueprint_query_returns_all_readers_in_the_room(index):
+    assert [reader['reader_number'] for reader in index.query('blueprint', 'A-PR.500')] == ['00042', '00043']
+
+
+def test_unknown_query(index):
+    with pytest.raises(ValueError, match='Unknown query'):
+        index.query('room', 'A-PR.500')
+
+
+def test_read_queries():
+    lines = ['# readers\n', 'reader 01234\n', '\n', '  email jana@example.com  \n', 'card\n']
+    assert list(read_queries(lines)) == [('reader', '01234'), ('email', 'jana@example.com'), ('card', '')]
@@ -0,0 +1,80 @@
+"""
+test_name_index.py
+Tests matching of supervisor names from the EFAS export to people by NameIndex and AuthorizationMapper.
+"""
+import pytest
+from data_readers import AuthorizationMapper, source_cache, workbook_cache
+from person import NameIndex, Person, name_tokens
+from reader import Reader
+from synthetic_data import SyntheticData
+
+JANA_NOVAKOVA = Person('1', 'Jana', 'Nováková')
+MARIE_NOVAKOVA = Person('2', 'Marie', 'Nováková')
+JANA_MALA = Person('3', 'Jana', 'Malá')
+PETR_SVOBODA = Person('4', 'Petr', 'Svoboda')
+
+
+@pytest.fixture
+def index():
+    return NameIndex([JANA_NOVAKOVA, MARIE_NOVAKOVA, JANA_MALA, PETR_SVOBODA, Person('5', None, 'Dvořák')])
+
+
+@pytest.mark.parametrize('name', ['Jana Nováková', 'jana novakova', 'JANA NOVÁKOVÁ', 'Novakova Jana',
+                                  'Nováková, Jana'])
+def test_find_ignores_diacritics_case_and_order(index, name):
+    assert index.find(name) == [JANA_NOVAKOVA]
+
+
+@pytest.mark.parametrize('name', ['Ing. Petr Svoboda', 'MUDr. Petr Svoboda, Ph.D.', 'Ing Petr Svoboda',
+                                  'Bc Svoboda Petr DiS', 'prof. MUDr Petr Svoboda CSc'])
+def test_find_ignores_titles_with_and_without_dots(index, name):
+    assert index.find(name) == [PETR_SVOBODA]
+
+
+def test_find_unknown_or_missing_name(index):
+    assert index.find(None) == []
+    assert index.find('') == []
+    assert index.find('Ing.') == []
+    assert index.find('Karel Novák') == []
+    # people without a first name are not indexed
+    assert index.find('Dvořák') == []
+    assert len(index) == 4
+
+
+def test_find_extra_token_matching_one_person(index):
+    assert index.find('Petr Pavel Svoboda') == [PETR_SVOBODA]
+
+
+@pytest.mark.parametrize('name', ['Jana Marie Nováková', 'Jana Nováková Malá'])
+def test_find_extra_token_matching_several_people_is_ambiguous(index, name):
+    assert index.find(name) == []
+
+
+def test_find_returns_all_people_with_the_same_name():
+    namesake = Person('6', 'Jana', 'Novakova')
+    assert NameIndex([JANA_NOVAKOVA, namesake]).find('Jana Nováková') == [JANA_NOVAKOVA, namesake]
+
+
+def test_name_tokens():
+    assert name_tokens(None) == []
+    assert name_tokens('  Ing. Jana   NOVÁKOVÁ, Ph.D. ') == ['jana', 'novakova']
+
+
+def test_ambiguous_names_are_not_authorized(tmp_path, monkeypatch):
+    monkeypatch.setattr(source_cache, 'enabled', False)
+    path = str(tmp_path / 'export_efas.xlsx')
+    SyntheticData.save(path,
+                       [('M1', 'Ambulance', None, 'A-PR.500', 'Jana Nováková Malá', 'Ing. Petr Svoboda', 'FN')],
+                       ['Kod mistnosti', 'Nazev standard', 'Doplnek nazvu', 'Kod projekt',
+                        'Vrchni sestra\\Ved.odb', 'Stanicni sestra/Ved.odb', 'Najemce'])
+    reader = Reader('00001', location_blueprint='A-PR.500')
+    mapper = AuthorizationMapper(path,
+                                 readers=[reader],
+                                 personel=[JANA_NOVAKOVA, MARIE_NOVAKOVA, JANA_MALA, PETR_SVOBODA])
+    try:
+        mapper.get_authorizations()
+    finally:
+        workbook_cache.clear()
+
+    assert list(reader.authorized_personel) == [PETR_SVOBODA]
+    assert list(mapper.unmatched_names) == ['Jana Nováková Malá']
@@ -0,0 +1,72 @@
+"""
+test_service.py
+Tests of QueryService over HTTP on localhost.
+"""
+import asyncio
+import json
+from database import Database
+from person import Person
+from reader import Reader
+from service import QueryService
+
+JANA = Person('1', 'Jana', 'Nováková', '1001', 'jana@example.com')
+ENTRANCE = Reader('00042', 'A-PR.500', 'FN', 'Ambulance', None)
+OFFICE = Reader('01234', 'B-P1.10', 'FN', 'Kancelar', None)
+
+
+def build(db: Database, readers: list[Reader]) -> None:
+    db.insert_people([JANA])
+    db.insert_readers(readers)
+    db.insert_authorizations((JANA, reader) for reader in readers)
+
+
+async def get(port: int, target: str) -> tuple[int, dict]:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode('latin-1'))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+
+def test_queries_cache_and_rebuild(tmp_path):
+    db_name = str(tmp_path / 'database.db')
+    db = Database(db_name, pragmas=Database.BUILD_PRAGMAS)
+    build(db, [ENTRANCE])
+    db.close()
+
+    async def scenario() -> None:
+        service = QueryService(db_name, pool_size=2)
+        server = await service.start('127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            status, body = await get(port, '/reader/42')
+            assert status == 200
+            assert body['results'][0]['reader_number'] == '00042'
+            assert body['results'][0]['people'] == ['1']
+
+            status, body = await get(port, '/room/A-PR.500')
+            assert status == 404
+            assert 'error' in body
+
+            assert (await get(port, '/person/1'))[1]['results'][0]['readers'] == ['00042']
+            assert (await get(port, '/person/1'))[1]['results'][0]['readers'] == ['00042']
+            status, health = await get(port, '/health')
+            assert status == 200
+            assert health['hits'] == 1
+
+            # the rebuilt database is published into the file the service reads
+            staging = Database.staging(db_name)
+            build(staging, [ENTRANCE, OFFICE])
+            staging.publish(db_name)
+
+            assert (await get(port, '/person/1'))[1]['results'][0]['readers'] == ['00042', '01234']
+            assert (await get(port, '/health'))[1]['hits'] == 1
+        finally:
+            server.close()
+            await server.wait_closed()
+            service.pool.close()
+
+    asyncio.run(scenario())
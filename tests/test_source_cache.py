@@ -0,0 +1,73 @@
+"""
+test_source_cache.py
+Tests of SourceCache entries on temporary files.
+"""
+import datetime
+import pytest
+from data_readers import SourceCache
+
+ROWS = [('A-PR.500', 42, 1.5, None, True),
+        ('Nováková', datetime.datetime(2024, 3, 1, 8, 30), datetime.date(2024, 3, 1), datetime.time(8, 30),
+         datetime.timedelta(hours=1))]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SourceCache(str(tmp_path / 'source_cache'))
+
+
+def write(path, contents: bytes) -> str:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(contents)
+    return str(path)
+
+
+def test_load_stored_rows(cache, tmp_path):
+    file_path = write(tmp_path / 'export_readers.xlsx', b'first')
+    assert cache.load(file_path, [2, 3]) is None
+    cache.store(file_path, [5, 4, 3, 2, 1], ROWS)
+
+    assert cache.load(file_path, [2, 3]) == ((1, 2, 3, 4, 5), ROWS)
+
+
+def test_changed_contents_invalidate_entry(cache, tmp_path):
+    file_path = write(tmp_path / 'export_readers.xlsx', b'first')
+    cache.store(file_path, [1, 2], ROWS)
+    write(tmp_path / 'export_readers.xlsx', b'second')
+
+    assert cache.load(file_path, [1, 2]) is None
+
+
+def test_changed_columns_miss(cache, tmp_path):
+    file_path = write(tmp_path / 'export_readers.xlsx', b'first')
+    cache.store(file_path, [1, 2], ROWS)
+
+    assert cache.load(file_path, [1, 2, 3]) is None
+    assert cache.load(file_path, [4]) is None
+
+
+def test_entries_of_files_with_the_same_name_are_kept(cache, tmp_path):
+    first = write(tmp_path / 'first' / 'export_readers.xlsx', b'first')
+    second = write(tmp_path / 'second' / 'export_readers.xlsx', b'second')
+    cache.store(first, [1], [('first',)])
+    cache.store(second, [1], [('second',)])
+
+    assert cache.load(first, [1]) == ((1,), [('first',)])
+    assert cache.load(second, [1]) == ((1,), [('second',)])
+
+
+def test_damaged_cache_is_a_miss(cache, tmp_path):
+    file_path = write(tmp_path / 'export_readers.xlsx', b'first')
+    write(tmp_path / 'source_cache' / SourceCache.FILE_NAME, b'not a database' * 100)
+
+    assert cache.load(file_path, [1]) is None
+    cache.store(file_path, [1], ROWS)
+
+
+def test_disabled_cache(tmp_path):
+    cache = SourceCache(str(tmp_path / 'source_cache'), enabled=False)
+    file_path = write(tmp_path / 'export_readers.xlsx', b'first')
+    cache.store(file_path, [1], ROWS)
+
+    assert cache.load(file_path, [1]) is None
+    assert not (tmp_path / 'source_cache').exists()